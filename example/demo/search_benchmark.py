@@ -0,0 +1,40 @@
+import os, sys, re, timeit
+
+_PATH = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, _PATH)
+
+from noval.extractor import Document, Extractor
+
+_EXAMPLE_DIR = f"{_PATH}/example/html"
+
+
+def make_search_page(rows: int) -> str:
+    """Repeat the result rows of `search_2.html` until the page has `rows` rows."""
+
+    with open(f"{_EXAMPLE_DIR}/search_2.html") as f:
+        html = f.read()
+
+    row_list = re.findall(r"<tr>.*?</tr>", html, flags=re.S)
+    body = "".join(row_list[i % len(row_list)] for i in range(rows))
+    start = html.index(row_list[0])
+    end = html.rindex(row_list[-1]) + len(row_list[-1])
+    return html[:start] + body + html[end:]
+
+
+def bench(rows: int, number: int = 20):
+    html = make_search_page(rows)
+    extractor = Extractor()
+    res = extractor.extract_search(html, "大主宰")
+
+    # A new `Document` each time, otherwise the parsed page is cached.
+    cost = timeit.timeit(
+        lambda: extractor.extract_search(Document(html), "大主宰"), number=number
+    )
+    print(
+        f"rows: {rows:>5}, results: {len(res):>5}, {cost / number * 1000:.2f} ms/page"
+    )
+
+
+if __name__ == "__main__":
+    for rows in (20, 200, 1000):
+        bench(rows)
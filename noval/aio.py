@@ -0,0 +1,331 @@
+"""Asyncio version of `Downloader`.
+
+Chapters are fetched concurrently with `aiohttp`, with at most `limit` requests
+in flight, and still written to the file in index order.
+"""
+
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from collections import deque
+from urllib import parse
+import asyncio
+import logging
+
+from .downloader import Downloader, DownloaderError
+from .executor import ExtractExecutor
+from .extractor import Document
+from .const import DEFAULT_HTM, HEADERS
+
+try:
+    import aiohttp
+except ModuleNotFoundError:
+    print("Use 'pip install aiohttp' to install aiohttp first.")
+    exit(1)
+
+logger = logging.getLogger(__name__)
+
+
+def sync_generator(agen: AsyncGenerator) -> Generator:
+    """Drive an async generator from sync code, values sent are passed through.
+
+    So the async download steps can be consumed by `pretty.download_with_bar`.
+    """
+
+    loop = asyncio.new_event_loop()
+    try:
+        value = None
+        while True:
+            try:
+                item = loop.run_until_complete(agen.asend(value))
+            except StopAsyncIteration:
+                return
+            value = yield item
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+class AsyncDownloader(Downloader):
+    """Fiction download API class based on asyncio.
+
+    Has the same steps as `Downloader`, `search_fiction` and `download_chapters`
+    are async generators, `get_chapters` is a coroutine. The pages are fetched by
+    `aget_html`, the sync methods of `Downloader` still work.
+    """
+
+    def __init__(self, *args, limit: int = 10, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        # Max number of requests in flight.
+        self.limit = limit
+
+    def _client_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.limit, ssl=self.verify),
+        )
+
+    #########
+    # tools
+    #########
+    async def _arequest(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        retry: int,
+        mode: Literal["get", "post"] = "get",
+        data: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+    ) -> Optional[Tuple[int, bytes, str, Mapping[str, str]]]:
+        """Async `Downloader._request`, return the status, body, true url and headers."""
+
+        if mode not in ("get", "post"):
+            raise DownloaderError("request method please give 'get' or 'post'.")
+
+        for wait in self._schedule(url, retry):
+            if wait is not None:
+                await asyncio.sleep(wait)
+                continue
+
+            try:
+                async with session.request(
+                    mode, url, data=data, headers=headers
+                ) as resp:
+                    if self._accept(url, resp.status, resp.headers):
+                        body = await resp.read()
+                        return resp.status, body, str(resp.url), resp.headers
+            except aiohttp.ClientSSLError:
+                raise DownloaderError(
+                    "Get SSLError, should set `verify` to False."
+                ) from None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                self.circuit_breaker.record_failure(url)
+
+        return None
+
+    async def _aget_content(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        kind: Optional[str] = None,
+    ) -> Tuple[bytes, str, Optional[str]]:
+        """Async `Downloader._get_content`."""
+
+        entry = self._cached(url, kind)
+        if entry is not None and self.cache.fresh(entry, kind):
+            return entry.body, entry.url, entry.content_type
+
+        headers = entry and self.cache.validators(entry)
+        resp = await self._arequest(session, url, self.retry, headers=headers)
+        if resp is None:
+            return b"", "", None
+        return self._received(url, kind, entry, *resp)
+
+    async def _aget_html(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        kind: Optional[str] = None,
+    ) -> Tuple[str, str]:
+        content, true_url, content_type = await self._aget_content(session, url, kind)
+        return self._decode(url, content, content_type), true_url
+
+    async def aget_html(self, url: str, kind: Optional[str] = None) -> Tuple[str, str]:
+        """Async `Downloader.get_html`."""
+
+        async with self._client_session() as session:
+            return await self._aget_html(session, url, kind)
+
+    ########
+    # step
+    ########
+    async def search_fiction(
+        self,
+        name: str,
+        deadline: Optional[float] = None,
+        enough: Optional[int] = None,
+    ) -> AsyncGenerator[List, None]:
+        """Yield result list of each search url in the order they complete.
+
+        Same arguments as `Downloader.search_fiction`.
+        """
+
+        async def search(
+            session: aiohttp.ClientSession, search_url: str
+        ) -> Optional[List]:
+            try:
+                html, _root_url = await self._aget_html(
+                    session, search_url.format(name), "search"
+                )
+                return self._extractor.extract_search(
+                    html or DEFAULT_HTM, name, search_url
+                )
+            except Exception as e:
+                # A broken mirror doesn't stop the search of the others.
+                logger.warning("Search failed on %s: %r", search_url, e)
+                return None
+
+        async with self._client_session() as session:
+            tasks = [
+                asyncio.ensure_future(search(session, search_url))
+                for search_url in self._search_list
+            ]
+            matched = 0
+            try:
+                for task in asyncio.as_completed(
+                    tasks, timeout=self.timeout if deadline is None else deadline
+                ):
+                    try:
+                        res = await task
+                    except asyncio.TimeoutError:
+                        return
+                    if res is None:
+                        continue
+
+                    yield res
+
+                    if enough:
+                        matched += sum(text.split("|")[0] == name for text, _ in res)
+                        if matched >= enough:
+                            return
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_chapters(self, next_url: str) -> List:
+        """Return a chapter list with name and url."""
+
+        extractor = self._extractor
+
+        async with self._client_session() as session:
+            html, u = await self._aget_html(session, next_url, "index")
+            # Parse once, the detail page fallback reuses the same document.
+            doc = Document(html or DEFAULT_HTM)
+            res = extractor.extract_chapters(doc, u)
+
+            if not res:
+                if next_url := extractor.extract_detail(doc, u):
+                    html, u = await self._aget_html(session, next_url, "index")
+                    res = extractor.extract_chapters(html or DEFAULT_HTM, u)
+
+        return res
+
+    async def download_chapters(
+        self,
+        down_chapters: List[Tuple[str, str]],
+        path: str,
+        sep: float = 0.0,
+        append_mode: bool = False,
+        resume: bool = False,
+        on_written: Optional[Callable[[int], None]] = None,
+        book_id: Optional[int] = None,
+    ) -> AsyncGenerator[Tuple[str, str], bool]:
+        """Yield (name, url) when finish once downloading, in the order of `down_chapters`.
+        Yield (None, None) when get html failed, re-try when receive True else closure.
+
+        Same arguments as `Downloader.download_chapters`.
+        """
+
+        # Extraction runs off the event loop, in the process pool when `extract_workers`.
+        executor = ExtractExecutor(self._extractor, self.extract_workers)
+        download = self._downloading(
+            down_chapters, path, sep, append_mode, resume, on_written, book_id
+        )
+
+        semaphore = asyncio.Semaphore(self.limit)
+        # Scheduled chapters, at most `limit * 2` contents are kept in memory.
+        tasks = deque()
+
+        async with self._client_session() as session:
+
+            async def get(url: str) -> Optional[str]:
+                html, _ = await self._aget_html(session, url, "chapter")
+                return html or None
+
+            async def fetch(url: str) -> str:
+                async with semaphore:
+                    if self.hedger is None:
+                        return await get(url) or ""
+                    return await self.hedger.acall(url, lambda: get(url)) or ""
+
+            async def load(url: str) -> Optional[str]:
+                """Fetch and extract the content, `None` when fetching failed."""
+
+                if not (html := await fetch(url)):
+                    return None
+
+                key = parse.urlparse(url).netloc
+
+                def extract() -> str:
+                    return executor.result(
+                        executor.submit(html, key=key), html, key=key
+                    )
+
+                return await asyncio.get_running_loop().run_in_executor(None, extract)
+
+            def schedule(chapter_iter: Iterator[Tuple[int, str, str]]):
+                while len(tasks) < self.limit * 2:
+                    if (chapter := next(chapter_iter, None)) is None:
+                        break
+
+                    if (content := self._stored(chapter[2])) is not None:
+                        task = asyncio.get_running_loop().create_future()
+                        task.set_result(content)
+                    else:
+                        task = asyncio.ensure_future(load(chapter[2]))
+                    tasks.append((*chapter, task))
+
+            try:
+                with executor, download as (writer, done):
+                    # Downloaded before resuming.
+                    for chapter_name, url in down_chapters:
+                        if url in done and done[url].size:
+                            yield chapter_name, url
+
+                    chapter_iter = (
+                        (index, *chapter)
+                        for index, chapter in enumerate(down_chapters)
+                        if chapter[1] not in done
+                    )
+                    schedule(chapter_iter)
+                    while tasks:
+                        index, chapter_name, url, task = tasks[0]
+                        content = await task
+
+                        if content is None:
+                            flag = yield (None, None)
+                            if flag:
+                                tasks[0] = (
+                                    index,
+                                    chapter_name,
+                                    url,
+                                    asyncio.ensure_future(load(url)),
+                                )
+                                continue
+                            else:
+                                return
+
+                        tasks.popleft()
+                        schedule(chapter_iter)
+
+                        writer.write(index, url, chapter_name, content)
+                        if content:
+                            yield chapter_name, url
+            finally:
+                for *_, task in tasks:
+                    task.cancel()
+                await asyncio.gather(
+                    *(task for *_, task in tasks), return_exceptions=True
+                )
@@ -5,22 +5,31 @@ It encapsulates the functions in noval and provides a set of interfaces for
 downloading novels. Can be used to build their own applications. Build with
 `fastapi`(https://github.com/tiangolo/fastapi). Support quick start in terminal.
 
+Requires `fastapi>=0.115.3` (`pip install "fastapi>=0.115.3"`), older versions
+come with starlette < 0.39, which ignores `Range` of `/download`.
+
 Start:
 	python3 -m noval.api
 
 Support Api:
-	/fiction?name=[name]
-	Get fiction list.
+	/fiction?name=[name]&enough=[n]
+	Get fiction list, `enough` is optional, stop searching once n exact matches found.
 
 	/chapters?key=[key]
 	Get the chapters list of key of one fiction.
 
-	/crawl?key=[key]
-	Try to crawl a fiction according to the key.
+	/chapter?key=[key]&index=[index]
+	Get a crawled chapter of one fiction, by its index in the chapters list.
+
+	/crawl?key=[key]&update=[bool]&format=[txt|epub]
+	Try to crawl a fiction according to the key, `update` only crawls the new chapters.
+	Saved as a txt file or an epub book, txt by default.
 
-	/crawl_status?key=[key]
+	/crawl_status?key=[key]&format=[txt|epub]
 	Get current crawl progress of key.
 
-	/download?key=[key]
+	/download?key=[key]&format=[txt|epub]
 	Download the fiction from remote according to the key.
+	Support `Range` and conditional requests, a txt file is sent gzip or brotli
+	(with `pip install brotli`) compressed when accepted.
 """
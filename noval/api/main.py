@@ -1,21 +1,31 @@
-from typing import Dict
+from typing import Dict, Literal, Optional, Set
 import os, threading
-from urllib.parse import urlencode
 
+from noval.cache import ResponseCache
 from noval.downloader import Downloader
+from noval.store import ChapterStore
+from noval.writer import new_chapters
 from .utils import encode64, decode64, local_exist, key2file
+from .utils import accepted_encoding, is_not_modified, precompress, variant_path
 from .code import *
 
 try:
-    from fastapi import FastAPI
-    from fastapi.responses import StreamingResponse, HTMLResponse
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import FileResponse, HTMLResponse, Response
     from fastapi.middleware.cors import CORSMiddleware
+    import starlette
 except ModuleNotFoundError:
-    print("Use 'pip install fastapi' to install fastapi first.")
+    print("Use 'pip install \"fastapi>=0.115.3\"' to install fastapi first.")
     exit(1)
 
+# `FileResponse` handles `Range` since starlette 0.39.
+if tuple(map(int, starlette.__version__.split(".")[:2])) < (0, 39):
+    print("Warn: upgrade to fastapi>=0.115.3 to resume the downloads with `Range`.")
 
-dr = Downloader(verify=False)
+
+# Search result, chapter index and chapter pages are cached locally, the
+# chapters crawled are kept in the store.
+dr = Downloader(verify=False, cache=ResponseCache(), store=ChapterStore())
 app = FastAPI()
 
 # CORS allow any host.
@@ -37,6 +47,30 @@ print(f"::{dir_path}")
 encodekey = lambda fname, url: encode64(f"{fname}@@@{url}")
 decodekey = lambda key: decode64(key).split("@@@")
 
+# Saving format -> media type of the downloaded file.
+MEDIA_TYPES = {"txt": "text/plain; charset=utf-8", "epub": "application/epub+zip"}
+Format = Literal["txt", "epub"]
+
+# Txt files being compressed, sent compressed by `/download`.
+compressing: Set[str] = set()
+compressing_lock = threading.Lock()
+
+
+def _precompress_later(filepath: str) -> None:
+    with compressing_lock:
+        if filepath in compressing:
+            return
+        compressing.add(filepath)
+
+    def _compress():
+        try:
+            precompress(filepath)
+        finally:
+            with compressing_lock:
+                compressing.discard(filepath)
+
+    threading.Thread(target=_compress, daemon=True).start()
+
 
 @app.get("/")
 def index():
@@ -47,13 +81,17 @@ def index():
 
 
 @app.get("/fiction")
-def get_fictions(name: str):
-    """Get fiction list follow name."""
+def get_fictions(name: str, enough: Optional[int] = None):
+    """Get fiction list follow name.
+
+    Mirrors are searched at once, return early when `enough` results with the
+    exact name are found.
+    """
     data = {}
 
     if name is not None:
         idx = 0
-        for each in dr.search_fiction(name):
+        for each in dr.search_fiction(name, enough=enough):
             for msg_string, url in each:
                 fname, dt, info = msg_string.split("|")
                 key = encodekey(fname, url)
@@ -70,9 +108,20 @@ def get_chapters(key: str):
     return {"data": dr.get_chapters(decodekey(key)[1])}
 
 
+@app.get("/chapter")
+def get_chapter(key: str, index: int):
+    """Get a crawled chapter of fiction, by its index in the chapters list."""
+    book_id = dr.store.book(decodekey(key)[1])
+    chapter = None if book_id is None else dr.store.get(book_id, index)
+    return {"data": chapter and chapter._asdict()}
+
+
 @app.get("/crawl")
-def crawl(key: str, force: bool = False):
-    """Try to crawl a fiction."""
+def crawl(key: str, force: bool = False, update: bool = False, format: Format = "txt"):
+    """Try to crawl a fiction, with `update` only the new chapters are crawled.
+
+    An epub book can't be appended, it is crawled again with `update`.
+    """
     global curr_chapter_idx
 
     # process fiction name
@@ -87,8 +136,11 @@ def crawl(key: str, force: bool = False):
             "status": CrawlStatus.NONE,
         }
     else:
-        filepath = key2file(key, dir_path)
+        filepath = key2file(key, dir_path, format)
         print("::", target_url, filepath)
+        task = f"{key}.{format}"
+        if format == "epub" and update:
+            force, update = True, False
 
         has_file: bool = local_exist(filepath)
 
@@ -101,32 +153,43 @@ def crawl(key: str, force: bool = False):
         }
 
         # check is crawling now.
-        is_crawling: bool = curr_crawl_idx.get(key, NO_STATUS) not in {
+        is_crawling: bool = curr_crawl_idx.get(task, NO_STATUS) not in {
             NO_STATUS,
             FINISH_STATUS,
         }
 
         # if file exist or crawling, then don't repeat.
-        if has_file and not force:
+        if has_file and not (force or update):
             pass
         elif is_crawling:
             return_data["status"] = CrawlStatus.RUNNING
-            return_data["total"] = total_dict.get(key, -1)
+            return_data["total"] = total_dict.get(task, -1)
         else:
             # get fiction chapters
             chapters = dr.get_chapters(target_url)
+            book_id = dr.store.add_book(target_url, fname, chapters)
+            if update and has_file:
+                # Only the chapters not saved yet, appended to the file.
+                chapters = new_chapters(filepath, chapters)
             print(chapters)
 
             if chapters:
-                return_data["total"] = total_dict[key] = len(chapters)
+                return_data["total"] = total_dict[task] = len(chapters)
                 return_data["status"] = CrawlStatus.START
-                curr_crawl_idx[key] = 0
+                curr_crawl_idx[task] = 0
 
                 def _c():
-                    for idx, msg in enumerate(dr.download_chapters(chapters, filepath)):
+                    for idx, msg in enumerate(
+                        dr.download_chapters(
+                            chapters, filepath, resume=update, book_id=book_id
+                        )
+                    ):
                         print(msg)
-                        curr_crawl_idx[key] = idx
-                    curr_crawl_idx[key] = FINISH_STATUS
+                        curr_crawl_idx[task] = idx
+                    curr_crawl_idx[task] = FINISH_STATUS
+
+                    if format == "txt":
+                        _precompress_later(filepath)
 
                 # start thread download.
                 threading.Thread(target=_c, daemon=True).start()
@@ -136,15 +199,15 @@ def crawl(key: str, force: bool = False):
 
 
 @app.get("/crawl_status")
-def get_crawl_status(key: str):
+def get_crawl_status(key: str, format: Format = "txt"):
     """Get current crawl progress of key."""
     global curr_crawl_idx
 
-    curr = curr_crawl_idx.get(key, NO_STATUS)
+    curr = curr_crawl_idx.get(f"{key}.{format}", NO_STATUS)
 
     # Only check whether file already exist when `NO_STATUS`. This ensures that the IO
     # query is executed at most once.
-    if curr == NO_STATUS and local_exist(key2file(key, dir_path)):
+    if curr == NO_STATUS and local_exist(key2file(key, dir_path, format)):
         curr = EXIST_STATUS
 
     return {
@@ -153,20 +216,55 @@ def get_crawl_status(key: str):
 
 
 @app.get("/download")
-def download(key: str):
-    """Download fiction follow key."""
-    fname, url = decodekey(key)
-    filename = f"{fname}.txt"
-    filepath = os.path.join(dir_path, f"{key}.txt")
-
-    def _iter_file():
-        with open(filepath) as file_like:
-            yield from file_like
+def download(request: Request, key: str, format: Format = "txt"):
+    """Download fiction follow key.
 
-    headers = {"Content-Disposition": f"attachment;{urlencode({'filename':filename})}"}
-    return StreamingResponse(
-        _iter_file(), headers=headers, media_type="text/plain; charset=utf-8"
+    The file is sent as is, with `Range` and validators support. A txt file is
+    sent pre-compressed when the client accepts it, the compressed variants are
+    written after crawling.
+    """
+    fname, url = decodekey(key)
+    filepath = key2file(key, dir_path, format)
+
+    if not local_exist(filepath):
+        raise HTTPException(status_code=404, detail="Fiction not crawled.")
+    # The size of a growing file is unknown.
+    if curr_crawl_idx.get(f"{key}.{format}", NO_STATUS) not in {
+        NO_STATUS,
+        FINISH_STATUS,
+    }:
+        raise HTTPException(status_code=409, detail="Fiction is crawling.")
+
+    path, headers = filepath, {}
+    if format == "txt":
+        headers["Vary"] = "Accept-Encoding"
+        encoding = accepted_encoding(
+            filepath, request.headers.get("accept-encoding", "")
+        )
+        if encoding is not None:
+            path = variant_path(filepath, encoding)
+            headers["Content-Encoding"] = encoding
+        else:
+            # Not compressed yet, for the next downloads.
+            _precompress_later(filepath)
+
+    response = FileResponse(
+        path,
+        headers=headers,
+        media_type=MEDIA_TYPES[format],
+        filename=f"{fname}.{format}",
+        stat_result=os.stat(path),
     )
+    if is_not_modified(request.headers, response.headers):
+        return Response(
+            status_code=304,
+            headers={
+                name: response.headers[name]
+                for name in ("etag", "last-modified", "vary")
+                if name in response.headers
+            },
+        )
+    return response
 
 
 # uvicorn api:app --reload
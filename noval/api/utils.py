@@ -1,5 +1,18 @@
+from typing import List, Mapping, Optional
+from email.utils import parsedate_to_datetime
 import base64
+import gzip
 import os
+import shutil
+
+try:
+    import brotli
+except ModuleNotFoundError:
+    # Only gzip variants without brotli.
+    brotli = None
+
+# Content-Encoding -> suffix of the pre-compressed variant, preferred first.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
 
 
 def encode64(s: str) -> str:
@@ -33,6 +46,95 @@ def local_exist(path: str, only_file: bool = True) -> bool:
     return os.path.isfile(path) if only_file else os.path.exists(path)
 
 
-def key2file(key: str, path: str = "") -> str:
+def key2file(key: str, path: str = "", fmt: str = "txt") -> str:
     """Trans the key to local file path."""
-    return os.path.join(path, f"{key}.txt")
+    return os.path.join(path, f"{key}.{fmt}")
+
+
+def encodings() -> List[str]:
+    """Encodings of the pre-compressed variants, preferred first."""
+    return [enc for enc in ENCODING_SUFFIXES if enc != "br" or brotli is not None]
+
+
+def variant_path(path: str, encoding: str) -> str:
+    return f"{path}{ENCODING_SUFFIXES[encoding]}"
+
+
+def variant_fresh(path: str, encoding: str) -> bool:
+    """Whether the variant is compressed from the current file.
+
+    The variant gets the mtime of the file when it is compressed.
+    """
+
+    try:
+        return os.stat(variant_path(path, encoding)).st_mtime == os.stat(path).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def precompress(path: str) -> None:
+    """Write the compressed variants of the file next to it, the fresh ones are kept."""
+
+    for encoding in encodings():
+        if variant_fresh(path, encoding):
+            continue
+
+        stat = os.stat(path)
+        target = variant_path(path, encoding)
+        tmp_path = f"{target}.tmp"
+        with open(path, "rb") as src:
+            if encoding == "gzip":
+                with gzip.open(tmp_path, "wb", compresslevel=9) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            else:
+                compressor = brotli.Compressor(quality=11)
+                with open(tmp_path, "wb") as dst:
+                    while chunk := src.read(1024 * 1024):
+                        dst.write(compressor.process(chunk))
+                    dst.write(compressor.finish())
+
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, target)
+
+
+def accepted_encoding(path: str, accept_encoding: str) -> Optional[str]:
+    """The encoding of a fresh variant accepted by the client, `None` for the file."""
+
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        if (param := params.strip()).startswith("q="):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+
+    for encoding in encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0 and variant_fresh(
+            path, encoding
+        ):
+            return encoding
+    return None
+
+
+def _strong(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(
+    request_headers: Mapping[str, str], response_headers: Mapping[str, str]
+) -> bool:
+    """Whether the validators of the request match the response, so 304 is enough."""
+
+    if if_none_match := request_headers.get("if-none-match"):
+        etag = _strong(response_headers.get("etag", ""))
+        tags = {_strong(tag.strip()) for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    try:
+        since = parsedate_to_datetime(request_headers["if-modified-since"])
+        return since >= parsedate_to_datetime(response_headers["last-modified"])
+    except (KeyError, TypeError, ValueError):
+        return False
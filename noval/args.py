@@ -11,6 +11,30 @@ def parse_cmd():
     parser.add_argument("name", type=str, help="fiction name.")
     parser.add_argument("--sep", type=float, help="sleep time.")
     parser.add_argument("--save-to", metavar="path", help="custom fiction save path.")
+    parser.add_argument(
+        "--workers", type=int, help="Number of threads to fetch chapters ahead."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use the local cache of fetched pages.",
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Keep the chapters in the local store, saved ones aren't downloaded again.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Export a book from the local store, without downloading.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("txt", "epub"),
+        default="txt",
+        help="Save as a txt file or an epub book. Defaults to txt.",
+    )
     parser.add_argument(
         "--range",
         nargs=2,
@@ -24,6 +48,16 @@ def parse_cmd():
         action="store_true",
         help="Whether it is in append mode. It is recreated by default.",
     )
+    exc_group.add_argument(
+        "--update",
+        action="store_true",
+        help="Only download the chapters not saved yet, like new published ones.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted download, skip the chapters already saved.",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -49,6 +83,13 @@ def main():
         "chapter_range": args.range,
         "split": args.split,
         "append_mode": args.append,
+        "resume": args.resume,
+        "update": args.update,
+        "workers": args.workers or 0,
+        "cache": not args.no_cache,
+        "fmt": args.format,
+        "store": args.store,
+        "offline": args.offline,
     }
 
     entry(conf)
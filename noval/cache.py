@@ -0,0 +1,177 @@
+from typing import Dict, NamedTuple, Optional
+import os
+import sqlite3
+import threading
+import time
+
+from .const import CACHE_PATH
+
+# Seconds a cached page is used without asking the site, by the kind of page.
+# Chapter pages hardly ever change, the search result and the index do.
+DEFAULT_TTLS = {
+    "search": 10 * 60,
+    "index": 60 * 60,
+    "chapter": 30 * 24 * 60 * 60,
+}
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    # The true url after redirects.
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: Optional[str]
+    stored: float
+
+
+class ResponseCache:
+    """On-disk cache of response bodies, stored in a sqlite database.
+
+    An entry younger than the ttl of its kind is used directly, an older one is
+    revalidated with `If-None-Match` / `If-Modified-Since` and refreshed when the
+    site answers 304. When the bodies exceed `max_size` bytes the least recently
+    used entries are evicted.
+
+    A hit doesn't write to the database, the access times are saved together
+    with the next write, or every `access_batch` hits.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        max_size: int = 256 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+        access_batch: int = 64,
+    ) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.access_batch = access_batch
+
+        # key -> access time not saved yet.
+        self._accessed: Dict[str, float] = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, body BLOB, etag TEXT, "
+            "last_modified TEXT, content_type TEXT, stored REAL, accessed REAL, "
+            "size INTEGER)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, url, etag, last_modified, content_type, stored "
+                "FROM responses WHERE key = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._accessed[url] = time.time()
+            if len(self._accessed) >= self.access_batch:
+                self._save_accessed()
+                self._db.commit()
+
+        return CacheEntry(*row)
+
+    def _save_accessed(self) -> None:
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def fresh(self, entry: CacheEntry, kind: str) -> bool:
+        """Whether the entry can be used without revalidation."""
+        return time.time() - entry.stored < self.ttls.get(kind, 0)
+
+    @staticmethod
+    def validators(entry: CacheEntry) -> Dict[str, str]:
+        """Headers of the conditional request revalidating the entry."""
+
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def put(self, url: str, body: bytes, true_url: str, headers) -> None:
+        """Store the body of a 200 response, `headers` is a case-insensitive mapping."""
+
+        now = time.time()
+        with self._lock:
+            self._save_accessed()
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (url,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    true_url,
+                    body,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    headers.get("Content-Type"),
+                    now,
+                    now,
+                    len(body),
+                ),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_size:
+                self._evict()
+            self._db.commit()
+
+    def touch(self, url: str) -> None:
+        """The site answered 304, the entry is fresh again."""
+
+        with self._lock:
+            self._save_accessed()
+            self._db.execute(
+                "UPDATE responses SET stored = ? WHERE key = ?", (time.time(), url)
+            )
+            self._db.commit()
+
+    def _evict(self) -> None:
+        # Evict to 90% of `max_size`, so not every `put` evicts.
+        target = self.max_size * 0.9
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._accessed.clear()
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._save_accessed()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,85 @@
+from typing import Dict, Optional
+from urllib import parse
+import codecs
+import re
+import threading
+
+# Only the head of the page is searched for `<meta charset>`.
+SNIFF_SIZE = 4096
+
+CONTENT_TYPE_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+META_CHARSET_RE = re.compile(
+    rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I | re.S
+)
+
+# Labels used by the sites but unknown to python.
+ALIASES = {"x-gbk": "gbk", "gb_2312-80": "gb2312"}
+# Declared encodings decoded with their superset, pages labeled gb2312 often
+# contain gbk characters.
+SUPERSETS = {"gb2312": "gb18030", "gbk": "gb18030", "ascii": "utf-8"}
+
+
+def normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """Python codec name of an encoding label, `None` when it is unknown."""
+
+    if not name:
+        return None
+    name = name.strip().lower()
+    try:
+        name = codecs.lookup(ALIASES.get(name, name)).name
+    except LookupError:
+        return None
+    return SUPERSETS.get(name, name)
+
+
+def charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    if content_type and (match := CONTENT_TYPE_CHARSET_RE.search(content_type)):
+        return normalize_encoding(match.group(1))
+    return None
+
+
+def sniff_charset(head: bytes) -> Optional[str]:
+    """Encoding declared by the BOM or `<meta charset>` in the head of the page."""
+
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8"
+    if match := META_CHARSET_RE.search(head[:SNIFF_SIZE]):
+        return normalize_encoding(match.group(1).decode("ascii"))
+    return None
+
+
+def decode(content: bytes, encoding: str) -> str:
+    """Decode the page, a few broken bytes should not abort the download."""
+    return content.decode(encoding, errors="replace")
+
+
+class CharsetResolver:
+    """Resolve the encoding of the pages of each host.
+
+    The `Content-Type` header is checked first, then the `<meta charset>` in the
+    first `SNIFF_SIZE` bytes, then `fallback` is used. The encoding found is
+    cached by host, so later pages of the host skip the detection.
+    """
+
+    def __init__(self, fallback: str = "utf-8") -> None:
+        self.fallback = fallback
+
+        self._hosts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[str]:
+        """The cached encoding of the host of url."""
+        return self._hosts.get(parse.urlparse(url).netloc)
+
+    def resolve(self, url: str, content_type: Optional[str], head: bytes) -> str:
+        if (encoding := self.get(url)) is not None:
+            return encoding
+
+        encoding = charset_from_content_type(content_type) or sniff_charset(head)
+        if encoding is None:
+            # Not cached, a later page of the host may declare it.
+            return self.fallback
+
+        with self._lock:
+            self._hosts[parse.urlparse(url).netloc] = encoding
+        return encoding
@@ -59,3 +59,14 @@ HEADERS = {
     "Accept-Language": "zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2",
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:106.0) Gecko/20100101 Firefox/106.0",
 }
+
+# Local response cache, set `NOVAL_CACHE` to change the location.
+CACHE_PATH = os.environ.get(
+    "NOVAL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "noval", "http.db")
+)
+
+# Local chapter store, set `NOVAL_STORE` to change the location.
+STORE_PATH = os.environ.get(
+    "NOVAL_STORE",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "noval", "books.db"),
+)
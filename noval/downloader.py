@@ -1,12 +1,51 @@
-from typing import Dict, List, Literal, Optional, Sequence, Tuple, Generator
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Generator,
+    Iterator,
+    Union,
+)
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib import parse
+import itertools
+import logging
+import queue
+import threading
 import time
-import textwrap
 import urllib3
 
-from .extractor import Extractor
+from .extractor import Document, Extractor
+from .cache import CacheEntry, ResponseCache
+from .charset import CharsetResolver, decode
+from .executor import ExtractExecutor
+from .hedge import Hedger
+from .store import ChapterStore, StoreWriter
+from .epub import EpubWriter
+from .writer import BackgroundWriter, ChapterRecord, ChapterWriter
+from .ratelimit import THROTTLE_STATUS, RateLimiter
+from .ratelimit import rate_limiter as shared_rate_limiter
+from .retry import CircuitBreaker, RetryPolicy
+from .retry import circuit_breaker as shared_circuit_breaker
 from .const import DEFAULT_HTM, SEARCH_LIST, HEADERS
 
 import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+
+def blank_page(page: Union[bytes, str]) -> bool:
+    """Whether the page is empty or only whitespace, which has nothing to parse."""
+    return not page or page.isspace()
 
 
 class DownloaderError(Exception):
@@ -26,64 +65,445 @@ class Downloader:
         verify: bool = True,
         urls: Optional[str] = None,
         extractor_class: Sequence[Extractor] = Extractor,
+        stream: bool = False,
+        chunk_size: int = 16 * 1024,
+        extract_workers: int = 0,
+        fetch_workers: int = 0,
+        lookahead: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        pool_sizes: Optional[Dict[str, int]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        max_cooldown: float = 30.0,
+        cache: Optional[ResponseCache] = None,
+        hedger: Optional[Hedger] = None,
+        store: Optional[ChapterStore] = None,
+        flush_every: int = 20,
+        flush_interval: float = 5.0,
+        fsync: bool = False,
     ) -> None:
         if urls is None:
             urls = []
         self.timeout = timeout
         self.retry = retry
+        # Used when a page doesn't declare its encoding.
         self.encoding = encoding
+        self.charsets = CharsetResolver(encoding)
         self.verify = verify
         if not verify:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+        # Parse pages incrementally while receiving instead of decoding the
+        # whole response first.
+        self.stream = stream
+        self.chunk_size = chunk_size
+        # Extract chapter content in a process pool when > 0.
+        self.extract_workers = extract_workers
+        # Fetch chapters in a thread pool ahead of the writer when > 0, at most
+        # `lookahead` (default 2 * fetch_workers) chapters are kept in memory.
+        self.fetch_workers = fetch_workers
+        self.lookahead = lookahead
+
+        # Keep-alive connections per host, default is enough for all fetch workers.
+        self.pool_size = pool_size or max(fetch_workers, 10)
+        # Custom pool size of some hosts, like: {"www.example.com": 20}
+        self.pool_sizes = pool_sizes or {}
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        # Per host limiter, shared by all downloaders of the process by default.
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        # Backoff between retries, and fail fast for the dead mirrors.
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker
+        # A request gives up rather than wait longer in all for the cool downs
+        # asked by a throttling site.
+        self.max_cooldown = max_cooldown
+        # Local response cache, pages are fetched every time when `None`.
+        self.cache = cache
+        # Hedge the slow chapter requests when given.
+        self.hedger = hedger
+        # Chapters in the store are not downloaded again, the chapters of the
+        # books given to `download_chapters` are saved to it.
+        self.store = store
+        # Flush the downloaded chapters every `flush_every` chapters or
+        # `flush_interval` seconds, wait until they reach the disk with `fsync`.
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
         self._search_list = [*SEARCH_LIST, *urls]
         self._extractor: Extractor = extractor_class()
 
+    @property
+    def session(self) -> requests.Session:
+        """The pooled session, shared by all threads using this downloader."""
+
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+
+        adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        for host, size in self.pool_sizes.items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount(f"http://{host}/", adapter)
+            session.mount(f"https://{host}/", adapter)
+
+        return session
+
+    def close(self) -> None:
+        """Close the pooled connections and the hedge threads."""
+
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self.hedger is not None:
+            self.hedger.close()
+
+    def __enter__(self) -> "Downloader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
     #########
     # tools
     #########
-    def _get_html(
+    def _send(
+        self,
+        url: str,
+        mode: Literal["get", "post"] = "get",
+        data: Optional[Dict] = None,
+        stream: bool = False,
+        headers: Optional[Dict] = None,
+    ) -> requests.Response:
+        kwargs = dict(
+            timeout=self.timeout, verify=self.verify, stream=stream, headers=headers
+        )
+        if mode == "get":
+            return self.session.get(url, **kwargs)
+        elif mode == "post":
+            return self.session.post(url, data, **kwargs)
+        else:
+            raise DownloaderError("request method please give 'get' or 'post'.")
+
+    def _request(
         self,
         url: str,
         retry: int,
         mode: Literal["get", "post"] = "get",
         data: Optional[Dict] = None,
-    ) -> Tuple[str, str]:
-        html, true_url = "", ""
+        stream: bool = False,
+        headers: Optional[Dict] = None,
+    ) -> Optional[requests.Response]:
+        """Send the request with retries, return `None` when all attempts failed.
 
-        try:
-            if mode == "get":
-                resp = requests.get(
-                    url, timeout=self.timeout, verify=self.verify, headers=HEADERS
-                )
-            elif mode == "post":
-                resp = requests.post(
-                    url, data, timeout=self.timeout, verify=self.verify, headers=HEADERS
-                )
-            else:
+        Connection errors, timeouts and the status codes of `retry_policy` are
+        retried after a backoff delay, see `_schedule` for when to give up.
+        """
+
+        for wait in self._schedule(url, retry):
+            if wait is not None:
+                time.sleep(wait)
+                continue
+
+            try:
+                resp = self._send(url, mode, data, stream, headers)
+            except requests.exceptions.SSLError:
                 raise DownloaderError(
-                    "request method please give 'get' or 'post'."
+                    "Get SSLError, should set `verify` to False."
                 ) from None
+            except (
+                requests.exceptions.ConnectTimeout,
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ReadTimeout,
+            ):
+                self.circuit_breaker.record_failure(url)
+                continue
+
+            if self._accept(url, resp.status_code, resp.headers):
+                return resp
+            resp.close()
+
+        return None
+
+    # The request policy, shared with the async I/O of `AsyncDownloader`.
+    def _schedule(self, url: str, retry: int) -> Iterator[Optional[float]]:
+        """Yield the seconds to sleep before each attempt, then `None` to send it.
+
+        Stop when all attempts are used, when the circuit of the host is open, or
+        when the cool downs asked by the site would keep the request waiting over
+        `max_cooldown` seconds, a host throttling us for long is left to the
+        circuit breaker.
+        """
+
+        breaker, bucket = self.circuit_breaker, self.rate_limiter.bucket(url)
+        cooled = 0.0
+
+        for attempt in range(retry + 1):
+            if attempt > 0:
+                yield self.retry_policy.delay(attempt - 1)
+
+            # Fail fast, before waiting for any cool down, when the host is down.
+            if not breaker.allow(url):
+                return
+            # The trial request of a half open circuit waits while it is open.
+            trial = breaker.is_open(url)
+
+            for wait in self.rate_limiter.waits(url):
+                if bucket.cooldown() > 0:
+                    cooled += wait
+                    if cooled > self.max_cooldown:
+                        return
+                    if not trial and breaker.is_open(url):
+                        return
+                yield wait
+
+            yield None
+
+    def _accept(self, url: str, status: int, headers: Mapping[str, str]) -> bool:
+        """Record the response status of url, return False if it should be retried."""
+
+        if status in THROTTLE_STATUS:
+            # Wait as the site asked, and stop asking a site that keeps refusing.
+            self.rate_limiter.backoff(url, headers.get("Retry-After"))
+            self.circuit_breaker.record_failure(url)
+        elif self.retry_policy.should_retry(status):
+            self.circuit_breaker.record_failure(url)
+        else:
+            self.rate_limiter.reset(url)
+            self.circuit_breaker.record_success(url)
+            return True
+        return False
+
+    def _cached(self, url: str, kind: Optional[str]) -> Optional[CacheEntry]:
+        """Cached entry of url, always `None` without cache or kind of the page."""
+
+        if self.cache is None or kind is None:
+            return None
+        entry = self.cache.get(url)
+        # An empty page can't be parsed, get it again.
+        return None if entry is None or blank_page(entry.body) else entry
+
+    def _store(
+        self,
+        url: str,
+        kind: Optional[str],
+        status: int,
+        body: bytes,
+        true_url: str,
+        headers: Mapping[str, str],
+    ) -> None:
+        # An empty page is a failed fetch, not cached.
+        if self.cache is not None and kind is not None and status == 200:
+            if not blank_page(body):
+                self.cache.put(url, body, true_url, headers)
+
+    def _received(
+        self,
+        url: str,
+        kind: Optional[str],
+        entry: Optional[CacheEntry],
+        status: int,
+        body: bytes,
+        true_url: str,
+        headers: Mapping[str, str],
+    ) -> Tuple[bytes, str, Optional[str]]:
+        """The page of a response to the request revalidating `entry`, see `_get_content`."""
+
+        if entry is not None and status == 304:
+            self.cache.touch(url)
+            return entry.body, entry.url, entry.content_type
+
+        if blank_page(body):
+            # lxml can't parse an empty page, it fails the same as no response.
+            return b"", "", None
+
+        self._store(url, kind, status, body, true_url, headers)
+        return body, true_url, headers.get("Content-Type")
+
+    def _get_document(
+        self, url: str, retry: int, kind: Optional[str] = None
+    ) -> Tuple[Optional[Document], str]:
+        """Feed the response chunks into an incremental parser while receiving."""
+
+        entry = self._cached(url, kind)
+        if entry is not None and self.cache.fresh(entry, kind):
+            return Document(self._decode_entry(url, entry)), entry.url
+
+        headers = entry and self.cache.validators(entry)
+        resp = self._request(url, retry, stream=True, headers=headers)
+        if resp is None:
+            return None, ""
+
+        if entry is not None and resp.status_code == 304:
+            resp.close()
+            self.cache.touch(url)
+            return Document(self._decode_entry(url, entry)), entry.url
+
+        # Keep the chunks while parsing only if the page is cached, otherwise the
+        # tree is all that is held.
+        keep = self.cache is not None and kind is not None
+        chunks = []
+        broken = False
+
+        def receive():
+            for chunk in resp.iter_content(self.chunk_size):
+                if keep:
+                    chunks.append(chunk)
+                yield chunk
+
+        try:
+            with resp:
+                chunk_iter = receive()
+                # The encoding is sniffed from the first chunk.
+                head = next(chunk_iter, b"")
+                encoding = self.charsets.resolve(
+                    url, resp.headers.get("Content-Type"), head
+                )
+                try:
+                    doc = Document.from_chunks(
+                        itertools.chain((head,), chunk_iter), encoding
+                    )
+                except etree.ParseError:
+                    # lxml fails on broken bytes, like in a GBK page, decode the
+                    # page as the non-stream mode so they are replaced.
+                    doc, broken = None, True
+                    for _ in chunk_iter:
+                        pass
         except (
-            requests.exceptions.ConnectTimeout,
+            requests.exceptions.ChunkedEncodingError,
             requests.exceptions.ConnectionError,
-            requests.exceptions.ReadTimeout,
         ):
-            # TODO: may header alive-keep
-            if retry > 0:
-                return self._get_html(url, retry - 1)
-        except requests.exceptions.SSLError:
-            raise DownloaderError(
-                "Get SSLError, should set `verify` to False."
-            ) from None
-        else:
-            html = resp.content.decode(self.encoding)
-            true_url = resp.url
+            return None, ""
+
+        true_url = resp.url
+        if keep:
+            body = b"".join(chunks)
+            self._store(url, kind, resp.status_code, body, true_url, resp.headers)
+
+        if broken:
+            if not keep:
+                # The chunks were not kept, get the page again.
+                if (resp := self._request(url, retry)) is None:
+                    return None, ""
+                chunks, true_url = [resp.content], resp.url
+            if not blank_page(html := decode(b"".join(chunks), encoding)):
+                doc = Document(html)
+
+        # An empty page failed the same as in the non-stream mode.
+        if doc is None:
+            return None, ""
+        return doc, true_url
+
+    def _decode(self, url: str, body: bytes, content_type: Optional[str]) -> str:
+        return decode(body, self.charsets.resolve(url, content_type, body))
+
+    def _decode_entry(self, url: str, entry: CacheEntry) -> str:
+        return self._decode(url, entry.body, entry.content_type)
+
+    def _get_content(
+        self, url: str, kind: Optional[str] = None
+    ) -> Tuple[bytes, str, Optional[str]]:
+        """Return the body, true url and `Content-Type` of the page."""
+
+        entry = self._cached(url, kind)
+        if entry is not None and self.cache.fresh(entry, kind):
+            return entry.body, entry.url, entry.content_type
+
+        headers = entry and self.cache.validators(entry)
+        if (resp := self._request(url, self.retry, headers=headers)) is None:
+            return b"", "", None
 
-        return html, true_url
+        return self._received(
+            url, kind, entry, resp.status_code, resp.content, resp.url, resp.headers
+        )
 
-    def get_html(self, url: str):
-        return self._get_html(url, self.retry)
+    def get_html(self, url: str, kind: Optional[str] = None) -> Tuple[str, str]:
+        """Return the decoded page and true url, the encoding is detected by host."""
+
+        content, true_url, content_type = self._get_content(url, kind)
+        return self._decode(url, content, content_type), true_url
+
+    def get_content(self, url: str, kind: Optional[str] = None) -> Tuple[bytes, str]:
+        """Return the raw response body and true url, empty body when failed.
+
+        With `cache`, `kind` is the kind of page ("search", "index" or "chapter")
+        deciding how long the cached body is used before revalidating it.
+        """
+
+        content, true_url, _ = self._get_content(url, kind)
+        return content, true_url
+
+    def get_document(
+        self, url: str, kind: Optional[str] = None
+    ) -> Tuple[Optional[Document], str]:
+        """Return the parsed page and its true url, `None` page when failed.
+
+        With `stream` mode the page is parsed incrementally from the response,
+        otherwise it is the same as wrapping `get_html` in a `Document`.
+        """
+
+        if self.stream:
+            return self._get_document(url, self.retry, kind)
+
+        html, true_url = self.get_html(url, kind)
+        return (Document(html) if html else None), true_url
+
+    def _search(self, search_url: str, name: str) -> List:
+        html, _root_url = self.get_html(search_url.format(name), "search")
+        return self._extractor.extract_search(html or DEFAULT_HTM, name, search_url)
+
+    def _create_writer(
+        self,
+        path: str,
+        append_mode: bool,
+        resume: bool,
+        on_written: Optional[Callable[[int], None]],
+        book_id: Optional[int] = None,
+    ) -> BackgroundWriter:
+        # The store writer calls the file writer in its own thread.
+        to_store = self.store is not None and book_id is not None
+
+        if path.lower().endswith(".epub"):
+            if append_mode or resume:
+                raise DownloaderError("Can't append to or resume an epub file.")
+            writer = EpubWriter(path, background=not to_store, on_written=on_written)
+        else:
+            writer = ChapterWriter(
+                path,
+                append_mode,
+                resume,
+                flush_every=self.flush_every,
+                flush_interval=self.flush_interval,
+                fsync=self.fsync,
+                background=not to_store,
+                on_written=on_written,
+            )
+
+        if not to_store:
+            return writer
+        return StoreWriter(
+            self.store,
+            book_id,
+            writer,
+            flush_every=self.flush_every,
+            flush_interval=self.flush_interval,
+            background=True,
+        )
+
+    def _stored(self, url: str) -> Optional[str]:
+        """Content of the chapter saved in the store, `None` if not saved."""
+        return None if self.store is None else self.store.content(url)
 
     def write(self, file: str, content: str, mode: str = "w") -> None:
         """Write content to file."""
@@ -95,30 +515,100 @@ class Downloader:
         with open(file, mode="w") as _:
             pass
 
+    @contextmanager
+    def _downloading(
+        self,
+        down_chapters: List[Tuple[str, str]],
+        path: str,
+        sep: float,
+        append_mode: bool,
+        resume: bool,
+        on_written: Optional[Callable[[int], None]],
+        book_id: Optional[int],
+    ) -> Iterator[Tuple[BackgroundWriter, Dict[str, ChapterRecord]]]:
+        """Set up a download, give its writer and the chapters done before it.
+
+        Shared by the sync and async `download_chapters`, see their arguments.
+        """
+
+        # Recreate the file, if not append or resume mode.
+        writer = self._create_writer(path, append_mode, resume, on_written, book_id)
+
+        # `sep` limits the request rate of the sites while downloading, shared by
+        # all requests to them.
+        urls = (url for _, url in down_chapters)
+        rate = 1 / sep if sep > 0 else None
+
+        with writer, self.rate_limiter.limit(urls, rate):
+            yield writer, dict(writer.done)
+
     ########
     # step
     ########
-    def search_fiction(self, name: str) -> Generator[List, None, None]:
-        """Yield result list of each search url."""
+    def search_fiction(
+        self,
+        name: str,
+        deadline: Optional[float] = None,
+        enough: Optional[int] = None,
+    ) -> Generator[List, None, None]:
+        """Search all search urls at once, yield result list of each search url in
+        the order they complete.
+
+        Args:
+            name (str): fiction name.
+            deadline (Optional[float], optional): seconds to wait for the mirrors,
+                the slower ones are skipped. Defaults to `timeout`.
+            enough (Optional[int], optional): stop once this number of results
+                with exactly the same title arrived. Defaults to None, wait all.
+        """
+
+        deadline = time.monotonic() + (self.timeout if deadline is None else deadline)
+        done = queue.SimpleQueue()
 
+        def search(search_url: str):
+            try:
+                done.put(self._search(search_url, name))
+            except Exception as e:
+                # A broken mirror doesn't stop the search of the others.
+                logger.warning("Search failed on %s: %r", search_url, e)
+                done.put(None)
+
+        # Daemon threads, a mirror over the deadline doesn't block the exit.
         for search_url in self._search_list:
-            html, _root_url = self.get_html(search_url.format(name))
-            yield self._extractor.extract_search(html or DEFAULT_HTM, name, search_url)
+            threading.Thread(target=search, args=(search_url,), daemon=True).start()
+
+        matched = 0
+        for _ in self._search_list:
+            try:
+                res = done.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return
+            if res is None:
+                continue
+
+            yield res
+
+            if enough:
+                matched += sum(text.split("|")[0] == name for text, _ in res)
+                if matched >= enough:
+                    return
 
     def get_chapters(self, next_url: str) -> List:
         """Return a chapter list with name and url."""
 
         extractor = self._extractor
 
-        html, u = self.get_html(next_url)
-        res = extractor.extract_chapters(html or DEFAULT_HTM, u)
+        # Parse once, the detail page fallback reuses the same document.
+        doc, u = self.get_document(next_url, "index")
+        doc = doc or Document(DEFAULT_HTM)
+        res = extractor.extract_chapters(doc, u)
         # print(res)
 
         if not res:
-            if next_url := extractor.extract_detail(html or DEFAULT_HTM, u):
+            if next_url := extractor.extract_detail(doc, u):
                 # print(f"Get next url: {next_url}")
-                html, u = self.get_html(next_url)
-                res = extractor.extract_chapters(html or DEFAULT_HTM, u)
+                doc, u = self.get_document(next_url, "index")
+                res = extractor.extract_chapters(doc or DEFAULT_HTM, u)
 
         return res
 
@@ -128,6 +618,9 @@ class Downloader:
         path: str,
         sep: float = 0.0,
         append_mode: bool = False,
+        resume: bool = False,
+        on_written: Optional[Callable[[int], None]] = None,
+        book_id: Optional[int] = None,
     ) -> Generator[Tuple[str, str], bool, None]:
         """
         Yield (name, url) when finish once downloading.
@@ -135,40 +628,125 @@ class Downloader:
 
         Args:
             down_chapters (List[Tuple[str, str]]): chapters list of need download.
-            path (str): saving dir path.
-            sep (float, optional): sleep time for each download. Defaults to 0.0.
+            path (str): saving file path, chapters are written into an EPUB book if it ends with `.epub`.
+            sep (float, optional): min interval between requests to the site. Defaults to 0.0.
             append_mode (bool, optional): whether download with append mode. Defaults to False.
+            resume (bool, optional): skip the chapters recorded in the manifest of path. Defaults to False.
+            on_written (Optional[Callable[[int], None]], optional): called with the bytes of each chapter written, in the writer thread. Defaults to None.
+            book_id (Optional[int], optional): id of the book in the store, the chapters are saved to the store. Defaults to None.
         """
 
-        extractor = self._extractor
+        executor = ExtractExecutor(self._extractor, self.extract_workers)
+        fetcher = (
+            ThreadPoolExecutor(self.fetch_workers) if self.fetch_workers > 0 else None
+        )
+        # Reorder buffer: chapters fetched or extracting ahead of the writer.
+        pending = deque()
+        if fetcher is not None:
+            window = max(self.lookahead or self.fetch_workers * 2, 1)
+        else:
+            window = max(self.extract_workers * 2, 1)
 
-        # Clear the file, if already exist and not append mode.
-        not append_mode and self.clear(path)
+        def get(url: str) -> Optional[Tuple[Union[bytes, Document], str]]:
+            """Return the page and its encoding, `None` when fetching failed."""
 
-        # Avoid frequent creation and destruction of IO.
-        with open(path, mode="a+") as f:
-            for chapter_name, url in down_chapters:
-                # console.print(chapter_name, url)
+            # The process pool needs raw bytes.
+            if executor.parallel:
+                content, _, content_type = self._get_content(url, "chapter")
+                if not content:
+                    return None
+                return content, self.charsets.resolve(url, content_type, content)
 
-                while True:
-                    html, _ = self.get_html(url)
+            doc, _ = self.get_document(url, "chapter")
+            return None if doc is None else (doc, self.encoding)
 
-                    if html:
-                        break
+        def fetch(url: str) -> Optional[Tuple[Union[bytes, Document], str]]:
+            if self.hedger is None:
+                return get(url)
+            return self.hedger.call(url, lambda: get(url))
 
-                    flag = yield (None, None)
-                    if flag:
-                        continue
-                    else:
-                        return
+        def load(url: str) -> Optional[str]:
+            """Fetch and extract in a fetch worker, `None` when fetching failed."""
 
-                content = extractor.extract_content(html)
+            if (page := fetch(url)) is None:
+                return None
 
-                if not content:
-                    continue
+            key = parse.urlparse(url).netloc
+            future = executor.submit(*page, key)
+            return executor.result(future, *page, key)
+
+        def submit(url: str) -> Tuple[Future, Optional[Tuple]]:
+            if (content := self._stored(url)) is not None:
+                future = Future()
+                future.set_result(content)
+                return future, None
+
+            if fetcher is not None:
+                return fetcher.submit(load, url), None
+
+            # Serial mode, fetch here and only extract ahead.
+            if (page := fetch(url)) is None:
+                future = Future()
+                future.set_result(None)
+                return future, None
 
-                chapter_content = f"{chapter_name}\n{textwrap.indent(content,'  ')}\n\n"
-                f.write(chapter_content)
+            # Chapters of the same site share one page template.
+            key = parse.urlparse(url).netloc
+            return executor.submit(*page, key), page
 
-                time.sleep(sep)
+        def result(url: str, future: Future, page) -> Optional[str]:
+            if page is None:
+                return future.result()
+            return executor.result(future, *page, parse.urlparse(url).netloc)
+
+        def write_head():
+            """Write the first pending chapter, return False when give up."""
+
+            index, chapter_name, url, future, page = pending[0]
+
+            while (content := result(url, future, page)) is None:
+                flag = yield (None, None)
+                if not flag:
+                    return False
+                future, page = submit(url)
+
+            pending.popleft()
+
+            # Formatted and written by the writer thread.
+            writer.write(index, url, chapter_name, content)
+            if content:
                 yield chapter_name, url
+
+            return True
+
+        download = self._downloading(
+            down_chapters, path, sep, append_mode, resume, on_written, book_id
+        )
+        # Avoid frequent creation and destruction of IO.
+        try:
+            with executor, download as (writer, done):
+                for index, (chapter_name, url) in enumerate(down_chapters):
+                    if (record := done.get(url)) is not None:
+                        # Downloaded before resuming.
+                        if record.size:
+                            yield chapter_name, url
+                        continue
+
+                    # console.print(chapter_name, url)
+                    pending.append((index, chapter_name, url, *submit(url)))
+
+                    while pending and (pending[0][3].done() or len(pending) >= window):
+                        if not (yield from write_head()):
+                            return
+
+                while pending:
+                    if not (yield from write_head()):
+                        return
+        finally:
+            for *_, future, _ in pending:
+                future.cancel()
+            if fetcher is not None:
+                fetcher.shutdown(wait=False)
+            # Stop the hedge threads, the pool is created again when needed.
+            if self.hedger is not None:
+                self.hedger.close()
@@ -0,0 +1,182 @@
+from typing import Callable, IO, List, Optional, Tuple
+from datetime import datetime, timezone
+from html import escape
+import hashlib
+import os
+import re
+import uuid
+import zipfile
+
+from .writer import BackgroundWriter, ChapterRecord
+
+CONTAINER_XML = """\
+<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+CHAPTER_XHTML = """\
+<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{language}">
+<head><title>{name}</title></head>
+<body>
+<h2>{name}</h2>
+{paragraphs}
+</body>
+</html>
+"""
+
+# Characters not allowed in xml.
+INVALID_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def xml_text(text: str) -> str:
+    return escape(INVALID_XML_RE.sub("", text), quote=True)
+
+
+def chapter_xhtml(name: str, content: str, language: str = "zh") -> str:
+    """A chapter as xhtml, each line of the content is a paragraph."""
+
+    paragraphs = "\n".join(
+        f"<p>{xml_text(line.strip())}</p>"
+        for line in content.split("\n")
+        if line.strip()
+    )
+    return CHAPTER_XHTML.format(
+        language=language, name=xml_text(name), paragraphs=paragraphs
+    )
+
+
+class EpubWriter(BackgroundWriter):
+    """Write chapters into an EPUB 3 book while downloading.
+
+    Each chapter is compressed into the zip as its own xhtml file as soon as it
+    comes, only the names of the chapters are kept, the package document and the
+    navigation are written by `close`. So the memory doesn't grow with the size
+    of the book. A book can't be appended or resumed, the zip is unfinished
+    until closed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        title: Optional[str] = None,
+        language: str = "zh",
+        identifier: Optional[str] = None,
+        flush_interval: float = 5.0,
+        background: bool = False,
+        max_pending: int = 64,
+        on_written: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        super().__init__(flush_interval, on_written)
+        self.path = path
+        self.title = title or os.path.splitext(os.path.basename(path))[0]
+        self.language = language
+        self.identifier = identifier or f"urn:uuid:{uuid.uuid4()}"
+
+        # (file name, chapter name) of the chapters written.
+        self._chapters: List[Tuple[str, str]] = []
+
+        self._file: IO[bytes] = open(path, "wb")
+        self._zip = zipfile.ZipFile(self._file, "w", zipfile.ZIP_DEFLATED)
+        # The mimetype must be the first file, not compressed.
+        self._zip.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        self._zip.writestr("META-INF/container.xml", CONTAINER_XML)
+        self.offset = self._file.tell()
+
+        self._start(background, max_pending)
+
+    def _write(self, index: int, url: str, name: str, content: str) -> None:
+        data = b""
+        if content:
+            file_name = f"text/chapter_{len(self._chapters) + 1:05d}.xhtml"
+            data = chapter_xhtml(name, content, self.language).encode("utf-8")
+            self._zip.writestr(f"OEBPS/{file_name}", data)
+            self._chapters.append((file_name, name))
+
+        # Size of the chapter compressed in the book.
+        size = self._file.tell() - self.offset
+        self.done[url] = ChapterRecord(
+            index, url, self.offset, size, hashlib.sha1(data).hexdigest(), name
+        )
+        self.offset += size
+        self._written(size)
+
+    def _write_lines(self, file_name: str, lines) -> None:
+        with self._zip.open(f"OEBPS/{file_name}", "w") as f:
+            for line in lines:
+                f.write(line.encode("utf-8"))
+
+    def _package_lines(self):
+        modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        yield (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" '
+            'unique-identifier="book-id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="book-id">{xml_text(self.identifier)}</dc:identifier>\n'
+            f"<dc:title>{xml_text(self.title)}</dc:title>\n"
+            f"<dc:language>{xml_text(self.language)}</dc:language>\n"
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            "</metadata>\n<manifest>\n"
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" '
+            'properties="nav"/>\n'
+            '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n'
+        )
+        for no, (file_name, _) in enumerate(self._chapters, start=1):
+            yield (
+                f'<item id="c{no}" href="{file_name}" '
+                'media-type="application/xhtml+xml"/>\n'
+            )
+        yield '</manifest>\n<spine toc="ncx">\n'
+        if not self._chapters:
+            yield '<itemref idref="nav"/>\n'
+        for no in range(1, len(self._chapters) + 1):
+            yield f'<itemref idref="c{no}"/>\n'
+        yield "</spine>\n</package>\n"
+
+    def _nav_lines(self):
+        yield (
+            '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" '
+            'xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'xml:lang="{xml_text(self.language)}">\n'
+            f"<head><title>{xml_text(self.title)}</title></head>\n<body>\n"
+            '<nav epub:type="toc"><ol>\n'
+        )
+        for file_name, name in self._chapters:
+            yield f'<li><a href="{file_name}">{xml_text(name)}</a></li>\n'
+        yield "</ol></nav>\n</body>\n</html>\n"
+
+    def _ncx_lines(self):
+        # For the EPUB 2 readers.
+        yield (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+            f'<head><meta name="dtb:uid" content="{xml_text(self.identifier)}"/>'
+            "</head>\n"
+            f"<docTitle><text>{xml_text(self.title)}</text></docTitle>\n<navMap>\n"
+        )
+        for no, (file_name, name) in enumerate(self._chapters, start=1):
+            yield (
+                f'<navPoint id="p{no}" playOrder="{no}"><navLabel><text>'
+                f'{xml_text(name)}</text></navLabel><content src="{file_name}"/>'
+                "</navPoint>\n"
+            )
+        yield "</navMap>\n</ncx>\n"
+
+    def _close(self) -> None:
+        if self._file.closed:
+            return
+
+        try:
+            self._write_lines("nav.xhtml", self._nav_lines())
+            self._write_lines("toc.ncx", self._ncx_lines())
+            self._write_lines("content.opf", self._package_lines())
+            self._zip.close()
+        finally:
+            self._file.close()
@@ -0,0 +1,121 @@
+from typing import Optional, Type, Union
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+
+from .charset import decode
+from .extractor import Document, Extractor
+
+# Extractor of current worker process, created by `_init_process`.
+_process_extractor: Optional[Extractor] = None
+
+
+def _init_process(extractor_class: Type[Extractor]) -> None:
+    global _process_extractor
+    _process_extractor = extractor_class()
+
+
+def _extract_in_process(
+    html: Union[bytes, str], encoding: str, key: Optional[str]
+) -> str:
+    if isinstance(html, bytes):
+        html = decode(html, encoding)
+    return _process_extractor.extract_content(Document(html), key)
+
+
+def _mp_context():
+    # The pool starts its workers from the fetch threads, a process with running
+    # threads must not be forked.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+class ExtractExecutor:
+    """Run `Extractor.extract_content` inline or in a process pool.
+
+    Content extraction is pure CPU work, with `workers > 0` the raw html bytes or
+    text are sent to a process pool so that several cores can be used. `submit` always
+    returns a future, in inline mode it is already done, so callers handle both
+    modes in the same way. Falls back to inline mode when the pool can't be
+    created or is broken.
+    """
+
+    def __init__(self, extractor: Extractor, workers: int = 0) -> None:
+        self.extractor = extractor
+        self.workers = workers
+
+        # The pool is shared by the fetch threads, one of them may close it.
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if workers > 0:
+            try:
+                self._pool = ProcessPoolExecutor(
+                    workers,
+                    mp_context=_mp_context(),
+                    initializer=_init_process,
+                    initargs=(type(extractor),),
+                )
+            except (OSError, NotImplementedError, ImportError):
+                self._pool = None
+
+    @property
+    def parallel(self) -> bool:
+        """Whether extraction runs in the process pool, it needs raw html bytes."""
+        return self._pool is not None
+
+    def _extract(
+        self, html: Union[bytes, str, Document], encoding: str, key: Optional[str]
+    ) -> str:
+        if isinstance(html, bytes):
+            html = Document(decode(html, encoding))
+        return self.extractor.extract_content(html, key)
+
+    def submit(
+        self,
+        html: Union[bytes, str, Document],
+        encoding: str = "utf-8",
+        key: Optional[str] = None,
+    ) -> Future:
+        pool = self._pool
+        if pool is not None and not isinstance(html, Document):
+            try:
+                return pool.submit(_extract_in_process, html, encoding, key)
+            except (BrokenProcessPool, RuntimeError):
+                self.close()
+
+        future = Future()
+        try:
+            future.set_result(self._extract(html, encoding, key))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def result(
+        self,
+        future: Future,
+        html: Union[bytes, str, Document],
+        encoding: str = "utf-8",
+        key: Optional[str] = None,
+    ) -> str:
+        """Return the result of future, re-extract inline if the pool broke."""
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self.close()
+            return self._extract(html, encoding, key)
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def __enter__(self) -> "ExtractExecutor":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
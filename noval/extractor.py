@@ -1,16 +1,22 @@
-from typing import Iterator, List, Tuple, Union, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Union, Optional
+from collections import OrderedDict
+from functools import lru_cache
 import re
+import threading
 import unicodedata
 
-from .utils import splicing_url, get_keyword_pattern
+from .utils import PriorityPattern, splicing_url, splicing_urls, get_keyword_pattern
 from .const import DATETIME_PATTERN, DETAIL_KEYWORD, HIGH_WEIGHT_KEYWORD
 
 import numpy as np
-from lxml.html import fromstring, HtmlElement
+from lxml import etree
+from lxml.html import fromstring, HtmlElement, HTMLParser
 
 
 high_weight_keyword_pattern = get_keyword_pattern(HIGH_WEIGHT_KEYWORD)
 detail_keyword_pattern = get_keyword_pattern(DETAIL_KEYWORD)
+datetime_pattern = PriorityPattern(DATETIME_PATTERN)
+anchor_href_xpath = etree.XPath(".//@href")
 
 
 def html2element(html: str) -> HtmlElement:
@@ -23,19 +29,163 @@ def html2element(html: str) -> HtmlElement:
     return element
 
 
-def iter_node(element: HtmlElement) -> Iterator:
-    yield element
-    for sub_element in element:
-        if isinstance(sub_element, HtmlElement):
-            yield from iter_node(sub_element)
+def normalize_element(element: HtmlElement) -> HtmlElement:
+    """对已经解析好的节点树做与 `html2element` 相同的处理：`<br>` 替换为换行，
+    文本使用 NFKC 归一化。只处理文本节点，纯 ASCII 的文本直接跳过."""
 
+    for br in list(element.iter("br")):
+        br.tail = "\n" + (br.tail or "")
+        br.drop_tag()
 
-def count_text_tag(element: HtmlElement, tag: str) -> int:
-    """当前标签下面的 text()和给定标签，都应该进行统计"""
+    for node in element.iter():
+        if node.text and not node.text.isascii():
+            node.text = unicodedata.normalize("NFKC", node.text)
+        if node.tail and not node.tail.isascii():
+            node.tail = unicodedata.normalize("NFKC", node.tail)
+
+    return element
+
+
+def chunks2element(
+    chunks: Iterable[bytes], encoding: str = "utf-8"
+) -> Optional[HtmlElement]:
+    """增量解析网页，边接收数据边解析，不需要拼接出完整的网页源码.
+
+    网页为空（或只有空白）时没有根节点，返回 None。
+    """
+
+    parser = HTMLParser(encoding=encoding)
+    # 没有任何数据块时 close 会抛出异常，先送入空数据使其同样返回 None
+    parser.feed(b"")
+    for chunk in chunks:
+        parser.feed(chunk)
+
+    root = parser.close()
+    return None if root is None else normalize_element(root)
+
+
+class Document:
+    """解析后的网页.
+
+    同一个页面只进行一次归一化和解析，所有 `Extractor.extract_*` 方法都可以接收该对象，
+    并共享按需计算的索引。
+    """
+
+    def __init__(
+        self, html: Optional[str] = None, element: Optional[HtmlElement] = None
+    ) -> None:
+        self.html = html
+
+        self._element: Optional[HtmlElement] = element
+        self._anchors: Optional[List[Tuple[HtmlElement, str]]] = None
+
+    @classmethod
+    def from_chunks(
+        cls, chunks: Iterable[bytes], encoding: str = "utf-8"
+    ) -> Optional["Document"]:
+        """通过 `chunks2element` 增量解析得到页面，不保留网页源码，空网页返回 None."""
+
+        element = chunks2element(chunks, encoding)
+        return None if element is None else cls(element=element)
+
+    @property
+    def element(self) -> HtmlElement:
+        if self._element is None:
+            self._element = html2element(self.html)
+        return self._element
+
+    @property
+    def anchors(self) -> List[Tuple[HtmlElement, str]]:
+        """页面中所有的 a 标签及其文本，按文档顺序排列."""
+
+        if self._anchors is None:
+            for _ in self.iter_anchors():
+                pass
+        return self._anchors
+
+    def iter_anchors(self) -> Iterator[Tuple[HtmlElement, str]]:
+        """按文档顺序迭代 a 标签及其文本.
+
+        索引已经建立时直接使用，否则边遍历边建立索引，调用方可以提前结束遍历，
+        只有完整遍历一次后索引才会被保存。
+        """
+
+        if self._anchors is not None:
+            yield from self._anchors
+            return
+
+        anchors = []
+        for node in self.element.iter("a"):
+            # 与 `.//text()` 相同
+            item = (node, "".join(node.itertext()))
+            anchors.append(item)
+            yield item
+        self._anchors = anchors
+
+
+@lru_cache(maxsize=16)
+def parse_document(html: str) -> Document:
+    """返回 html 对应的 `Document`，相同内容的页面只解析一次."""
+
+    return Document(html)
+
+
+def to_document(html: Union[str, Document]) -> Document:
+    return html if isinstance(html, Document) else parse_document(html)
+
+
+def get_anchor_href(node: HtmlElement) -> Optional[str]:
+    """与 `node.xpath(".//@href")[0]` 相同，优先使用节点自身的 href."""
+
+    if (href := node.get("href")) is not None:
+        return href
+    return next(iter(anchor_href_xpath(node)), None)
+
+
+def get_row_text(node: HtmlElement) -> List[str]:
+    """与 `node.xpath("../..//text()")` 相同，返回节点所在行（祖父节点）的文本."""
+
+    parent = node.getparent()
+    row = parent.getparent() if parent is not None else None
+    return [] if row is None else list(row.itertext())
 
-    tag_num = len(element.xpath(f".//{tag}"))
-    direct_text = len(element.xpath("text()"))
-    return tag_num + direct_text
+
+def count_descendant_tags(
+    element: HtmlElement, tags: Iterable[str]
+) -> Tuple[List[HtmlElement], Dict[str, List[int]]]:
+    """一次遍历统计 element 及其所有子孙节点下，各个给定标签的子孙节点数量.
+
+    结果与对每个节点调用 `len(node.xpath(f".//{tag}"))` 一致，但子节点的统计会向上
+    累加到父节点，嵌套的列表不会被重复遍历。
+
+    Returns:
+        节点列表（先序）和每个标签对应的数量列表。
+    """
+
+    nodes: List[HtmlElement] = list(element.iter(etree.Element))
+    index = {node: idx for idx, node in enumerate(nodes)}
+    counts = {tag: [0] * len(nodes) for tag in tags}
+
+    # 先序的逆序保证处理父节点之前，所有子节点已经处理完毕
+    for idx in range(len(nodes) - 1, 0, -1):
+        node = nodes[idx]
+        parent_idx = index[node.getparent()]
+        for tag, tag_counts in counts.items():
+            tag_counts[parent_idx] += tag_counts[idx] + (node.tag == tag)
+
+    return nodes, counts
+
+
+def count_direct_text(element: HtmlElement) -> int:
+    """与 `len(element.xpath("text()"))` 相同."""
+
+    return (element.text is not None) + sum(child.tail is not None for child in element)
+
+
+def get_direct_text(element: HtmlElement) -> str:
+    """与 `"".join(element.xpath("text()"))` 相同."""
+
+    return "".join([element.text or "", *(child.tail or "" for child in element)])
 
 
 def get_all_text_of_element(element_list: Union[List, HtmlElement]) -> List[str]:
@@ -74,112 +224,317 @@ def need_skip_ltgi(ti: int, lti: int) -> bool:
     return ti // (lti + 1) > 10  # 正文的字符数量是链接字符数量的十倍以上
 
 
-def increase_tag_weight(ti: int, element: HtmlElement) -> int:
-    """如果标签为 `<content>` 这类更容易包含内容的标签，则增加该节点的权重."""
+def is_high_weight_tag(element: HtmlElement) -> bool:
+    """标签是否为 `<content>` 这类更容易包含内容的标签."""
 
     tag = element.tag.lower()
     tag_class = element.get("class", "").lower()
 
-    if high_weight_keyword_pattern.search(
-        tag_class
-    ) or high_weight_keyword_pattern.search(tag):
+    return bool(
+        high_weight_keyword_pattern.search(tag_class)
+        or high_weight_keyword_pattern.search(tag)
+    )
+
+
+def increase_tag_weight(ti: int, element: HtmlElement) -> int:
+    """如果标签为 `<content>` 这类更容易包含内容的标签，则增加该节点的权重."""
+
+    if is_high_weight_tag(element):
         return ti + ti // 2
     return ti
 
 
-def calc_text_density(element: HtmlElement) -> float:
-    """
-    根据公式：
+def count_punctuation_num(text: str) -> int:
+    """计算文字中符号的个数."""
+
+    return sum(char in """！，。？、；：“”‘’《》「」【】%（）,.?:;'"!%()""" for char in text)
 
-            Ti - LTi
-    TDi = -----------
-            TGi - LTGi
 
+def _clear_text_len(text: Optional[str]) -> Tuple[int, int]:
+    """返回文本按 `get_all_text_of_element` 清洗后的 (长度, 符号数)，空文本返回 (-1, 0)."""
 
-    Ti:节点 i 的字符串字数
-    LTi：节点 i 的带链接的字符串字数
-    TGi：节点 i 的标签数
-    LTGi：节点 i 的带连接的标签数
+    if not text:
+        return -1, 0
+    text = text.strip()
+    if not text:
+        return -1, 0
+    clear_text = re.sub(r"[^\S\n]+", " ", text)
+    return len(clear_text), count_punctuation_num(clear_text)
 
-    TDi: 是衡量一个网页的每个结点文本密度, 如果一个结点的纯文本字数比带链接的文本字
-         数明显多很多的时候, 该结点的文本密度就会很大
 
-    :return:
+def calc_all_text_density(element: HtmlElement) -> Tuple[List[HtmlElement], Dict]:
     """
+    一次后序遍历计算 element 及其所有子孙节点的文本密度信息，子节点的统计会向上累加
+    到父节点，不再对每个节点重复执行 `.//text()`、`.//a`、`.//*` 查询，也不会为每个
+    祖先节点拼接一份完整的文本。
 
-    ti_text = "\n".join(get_all_text_of_element(element))
-    # ti_text = re.sub(r"[ \n]+", "\n", ti_text)
-    ti = len(ti_text)
-    ti = increase_tag_weight(ti, element)
+            Ti - LTi                 Ti - LTi
+    TDi = -----------       SbDi = -----------
+            TGi - LTGi               Sbi + 1
 
-    a_tag_list = element.xpath(".//a")
-    lti = len("".join(get_all_text_of_element(a_tag_list)))
+    Ti：节点 i 的字符串字数，LTi：节点 i 的带链接的字符串字数，TGi：节点 i 的标签数，
+    LTGi：节点 i 的带连接的标签数，Sbi：符号数量。TDi 为文本密度，SbDi 为符号密度。
 
-    tgi = len(element.xpath(".//*"))
-    ltgi = len(a_tag_list)
-    if (tgi - ltgi) == 0:
-        if need_skip_ltgi(ti, lti):
-            ltgi = 0
-        else:
-            return {
-                "density": 0,
-                "ti_text": ti_text,
-                "ti": ti,
-                "lti": lti,
-                "tgi": tgi,
-                "ltgi": ltgi,
-            }
-    density = (ti - lti) / (tgi + 1 - ltgi)  # 防止 tgi == ltgi == 0
-    return {
+    Returns:
+        节点列表（先序）和每个节点对应的统计信息数组：
+        ti, lti, tgi, ltgi, density, p_tag_count, sbi, sbdi。
+    """
+
+    nodes: List[HtmlElement] = list(element.iter(etree.Element))
+    index = {node: idx for idx, node in enumerate(nodes)}
+    size = len(nodes)
+
+    # 子树内的文本片段数、清洗后文本长度、符号数
+    piece_num = [0] * size
+    text_len = [0] * size
+    sbi = [0] * size
+    # 子树内 a 标签的文本长度、标签数、a 标签数、p 标签数
+    lti = [0] * size
+    tgi = [0] * size
+    ltgi = [0] * size
+    p_num = [0] * size
+    direct_text = [0] * size
+
+    # 先序的逆序保证处理父节点之前，所有子节点已经处理完毕
+    for idx in range(size - 1, -1, -1):
+        node = nodes[idx]
+
+        # 节点自身的 text 以及所有子节点（包括注释）的 tail
+        direct = [node.text]
+        direct.extend(child.tail for child in node)
+        for text in direct:
+            if text is None:
+                continue
+            direct_text[idx] += 1
+            length, punctuation = _clear_text_len(text)
+            if length >= 0:
+                piece_num[idx] += 1
+                text_len[idx] += length
+                sbi[idx] += punctuation
+
+        if idx == 0:
+            continue
+
+        parent_idx = index[node.getparent()]
+        piece_num[parent_idx] += piece_num[idx]
+        text_len[parent_idx] += text_len[idx]
+        sbi[parent_idx] += sbi[idx]
+        lti[parent_idx] += lti[idx]
+        tgi[parent_idx] += tgi[idx] + 1
+        ltgi[parent_idx] += ltgi[idx]
+        p_num[parent_idx] += p_num[idx]
+
+        tag = node.tag.lower()
+        if tag == "a":
+            lti[parent_idx] += text_len[idx]
+            ltgi[parent_idx] += 1
+        elif tag == "p":
+            p_num[parent_idx] += 1
+
+    lti_arr = np.array(lti, dtype=np.int64)
+    tgi_arr = np.array(tgi, dtype=np.int64)
+    ltgi_arr = np.array(ltgi, dtype=np.int64)
+
+    # 与 "\n".join(...) 的长度一致
+    ti_arr = np.array(text_len, dtype=np.int64) + np.maximum(
+        np.array(piece_num, dtype=np.int64) - 1, 0
+    )
+    weighted = np.array([is_high_weight_tag(node) for node in nodes], dtype=bool)
+    ti_arr = np.where(weighted, ti_arr + ti_arr // 2, ti_arr)
+
+    # tgi == ltgi 时，参考 `need_skip_ltgi` 决定忽略 ltgi 还是密度记为 0
+    no_text_tag = tgi_arr == ltgi_arr
+    skip_ltgi = ti_arr // (lti_arr + 1) > 10
+    ltgi_used = np.where(no_text_tag & skip_ltgi, 0, ltgi_arr)
+    density = (ti_arr - lti_arr) / (tgi_arr + 1 - ltgi_used)
+    density[no_text_tag & ~skip_ltgi] = 0
+
+    sbi_arr = np.array(sbi, dtype=np.int64)
+    sbdi = (ti_arr - lti_arr) / (sbi_arr + 1)
+    sbdi[sbdi == 0] = 1  # sbdi 不能为0，否则会导致求对数时报错。
+
+    return nodes, {
+        "ti": ti_arr,
+        "lti": lti_arr,
+        "tgi": tgi_arr,
+        "ltgi": ltgi_arr,
         "density": density,
-        "ti_text": ti_text,
-        "ti": ti,
-        "lti": lti,
-        "tgi": tgi,
-        "ltgi": ltgi,
+        "p_tag_count": np.array(p_num, dtype=np.int64)
+        + np.array(direct_text, dtype=np.int64),
+        "sbi": sbi_arr,
+        "sbdi": sbdi,
     }
 
 
-def count_punctuation_num(text: str) -> int:
-    """计算文字中符号的个数."""
+def calc_score(
+    density: np.ndarray, p_tag_count: np.ndarray, sbdi: np.ndarray
+) -> np.ndarray:
+    """
+    score = 1 * ndi * log10(p_tag_count + 2) * log(sbdi)
 
-    return sum(char in """！，。？、；：“”‘’《》「」【】%（）,.?:;'"!%()""" for char in text)
+    1：在论文里面，这里使用的是 log(std)，但是每一个密度都乘以相同的对数，他们的相对大小是不会改变的，所以我们没有必要计算
+    ndi：节点 i 的文本密度
+    p_tag_count: 正文所在标签数。例如正文在<p></p>标签里面，这里就是 p 标签数，如果正文在<div></div>标签，这里就是 div 标签数
+    sbdi：节点 i 的符号密度
+    """
 
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = density * np.log10(p_tag_count + 2) * np.log(sbdi)
+    # 符号密度为负时得分为 nan，不应被选中
+    return np.where(np.isnan(score), -np.inf, score)
+
+
+def calc_new_score(node_info_dict: dict) -> None:
+    """为 `node_info_dict` 中的每个节点计算 `calc_score` 得分."""
+
+    node_infos = list(node_info_dict.values())
+    scores = calc_score(
+        np.array([x["density"] for x in node_infos], dtype=np.float64),
+        np.array([x["p_tag_count"] for x in node_infos], dtype=np.float64),
+        np.array([x["sbdi"] for x in node_infos], dtype=np.float64),
+    )
+    for node_info, score in zip(node_infos, scores):
+        node_info["score"] = score
 
-def calc_sbdi(text: str, ti: int, lti: int) -> float:
-    """
-             Ti - LTi
-    SbDi = --------------
-              Sbi + 1
 
-    SbDi: 符号密度
-    Sbi：符号数量
+def top_k(scores: np.ndarray, k: int = 1) -> np.ndarray:
+    """返回得分最高的 k 个下标，按得分从高到低排列，得分相同时先出现的节点在前."""
 
-    :return:
+    k = min(k, len(scores))
+    if k == 1:
+        return np.array([np.argmax(scores)])
+    order = np.argsort(-scores, kind="stable")
+    return order[:k]
+
+
+class Scorer:
+    """正文节点打分器.
+
+    `features` 为 `calc_all_text_density` 返回的统计信息数组，`score` 需要返回
+    与节点一一对应的得分数组。自定义打分公式时继承该类并重写 `score` 即可。
     """
 
-    sbi = count_punctuation_num(text)
-    sbdi = (ti - lti) / (sbi + 1)
-    return sbdi or 1  # sbdi 不能为0，否则会导致求对数时报错。
+    def score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        return calc_score(
+            features["density"], features["p_tag_count"], features["sbdi"]
+        )
 
+    def score_batch(
+        self, features_list: List[Dict[str, np.ndarray]]
+    ) -> List[np.ndarray]:
+        """将多个页面的统计信息拼接后一次性打分，再按页面拆分结果."""
 
-def calc_new_score(node_info_dict: dict) -> None:
+        if not features_list:
+            return []
+
+        offsets = np.cumsum([len(x["density"]) for x in features_list])[:-1]
+        merged = {
+            key: np.concatenate([x[key] for x in features_list])
+            for key in features_list[0]
+        }
+        return np.split(self.score(merged), offsets)
+
+
+def element_signature(element: HtmlElement) -> str:
+    """生成节点的结构签名（XPath）.
+
+    从节点向上逐级记录标签名和 class，遇到带 id 的祖先节点时以该节点为锚点停止，
+    否则一直记录到 `<body>`，例如：`//div[@id="main"]/div[@class="txt"]`。
     """
-    score = 1 * ndi * log10(p_tag_count + 2) * log(sbdi)
 
-    1：在论文里面，这里使用的是 log(std)，但是每一个密度都乘以相同的对数，他们的相对大小是不会改变的，所以我们没有必要计算
-    ndi：节点 i 的文本密度
-    p_tag_count: 正文所在标签数。例如正文在<p></p>标签里面，这里就是 p 标签数，如果正文在<div></div>标签，这里就是 div 标签数
-    sbdi：节点 i 的符号密度
+    steps = []
+    node = element
+    anchored = False
+
+    while node is not None and node.tag.lower() not in ("body", "html"):
+        tag = node.tag.lower()
+        node_id = node.get("id", "")
+        node_class = node.get("class", "")
+
+        if node_id and '"' not in node_id:
+            steps.append(f'{tag}[@id="{node_id}"]')
+            anchored = True
+            break
+        elif node_class and '"' not in node_class:
+            steps.append(f'{tag}[@class="{node_class}"]')
+        else:
+            steps.append(tag)
+        node = node.getparent()
+
+    steps.reverse()
+    if anchored:
+        return "//" + "/".join(steps)
+    return "//body" + "".join(f"/{step}" for step in steps)
+
+
+class ContentTemplateCache:
+    """正文节点模板缓存.
+
+    同一本书（或同一个站点）的所有章节页面通常使用相同的模板。完整的密度算法连续
+    `learn_count` 次在同一个 key 下选中签名相同的节点后，该签名被认为可靠，之后直接
+    使用编译好的 XPath 提取正文，并通过文本长度和符号密度做简单校验，校验失败时
+    回退到完整算法。缓存按 LRU 淘汰。
     """
 
-    for node_hash, node_info in node_info_dict.items():
-        score = (
-            node_info["density"]
-            * np.log10(node_info["p_tag_count"] + 2)
-            * np.log(node_info["sbdi"])
-        )
-        node_info_dict[node_hash]["score"] = score
+    def __init__(self, max_size: int = 128, learn_count: int = 2) -> None:
+        self.max_size = max_size
+        self.learn_count = learn_count
+
+        # key -> [signature, hits, compiled xpath, avg length, avg punctuation ratio]
+        self._cache: "OrderedDict[str, List]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[etree.XPath]:
+        """返回 key 对应的已确认模板，没有时返回 None."""
+
+        with self._lock:
+            template = self._cache.get(key)
+            if template is None:
+                return None
+            self._cache.move_to_end(key)
+
+        return template[2] if template[1] >= self.learn_count else None
+
+    def validate(self, key: str, text: str) -> bool:
+        """快速校验模板提取的结果：长度和符号密度不能明显低于学习到的平均值."""
+
+        with self._lock:
+            template = self._cache.get(key)
+        if template is None or not text:
+            return False
+
+        avg_len, avg_ratio = template[3], template[4]
+        ratio = count_punctuation_num(text) / len(text)
+        return len(text) >= avg_len * 0.3 and ratio >= avg_ratio * 0.3
+
+    def learn(self, key: str, signature: str, text: str) -> None:
+        """记录完整算法的提取结果."""
+
+        length = len(text)
+        ratio = count_punctuation_num(text) / length if length else 0.0
+
+        with self._lock:
+            template = self._cache.get(key)
+            if template is None or template[0] != signature:
+                try:
+                    xpath = etree.XPath(signature)
+                except etree.XPathSyntaxError:
+                    self._cache.pop(key, None)
+                    return
+                self._cache[key] = [signature, 1, xpath, length, ratio]
+            else:
+                count = template[1]
+                template[1] = count + 1
+                template[3] = (template[3] * count + length) / (count + 1)
+                template[4] = (template[4] * count + ratio) / (count + 1)
+            self._cache.move_to_end(key)
+
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
 
 
 class Extractor:
@@ -188,8 +543,15 @@ class Extractor:
     Principle reference: https://kns.cnki.net/KCMS/detail/detail.aspx?dbname=CJFDLAST2019&filename=GWDZ201908029
     """
 
-    def __init__(self, base_url: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        scorer: Optional[Scorer] = None,
+        template_cache: Optional[ContentTemplateCache] = None,
+    ) -> None:
         self.base_url = base_url
+        self.scorer = scorer or Scorer()
+        self.template_cache = template_cache or ContentTemplateCache()
 
     def set_base_url(self, url: str) -> "Extractor":
         self.base_url = url
@@ -207,18 +569,15 @@ class Extractor:
                 fiction = text
 
             # update time.
+            elif dt := datetime_pattern.search(text):
+                update_time = dt
             else:
-                for dt in DATETIME_PATTERN:
-                    if dt_obj := re.search(dt, text):
-                        update_time = dt_obj[1]
-                        break
-                else:
-                    other.append(text)
+                other.append(text)
 
         return [fiction, update_time, ",".join(other)]
 
     def extract_search(
-        self, html: str, name: str, cur_url: Optional[str] = None
+        self, html: Union[str, Document], name: str, cur_url: Optional[str] = None
     ) -> List[Tuple]:
         """提取小说搜索结果
 
@@ -235,55 +594,55 @@ class Extractor:
         """
 
         cur_url = cur_url or self.base_url or ""
-        element = html2element(html)
+        doc = to_document(html)
 
         res = []
 
-        for node in iter_node(element):
-            if node.tag.lower() == "a":
-                a_text = "".join(node.xpath(".//text()"))
-                if name in a_text:
-                    url = node.xpath(".//@href")
-                    text_list = node.xpath("../..//text()")
-                    clear_text_list = [
-                        re.sub(r"\s+", " ", x) for x in text_list if x.strip()
-                    ]
-                    clear_text_list = self._process_ndo(clear_text_list, name)
-                    text = "|".join(clear_text_list)
-                    if url:
-                        res.append((text, splicing_url(cur_url, url[0])))
+        for node, a_text in doc.anchors:
+            if name not in a_text or (url := get_anchor_href(node)) is None:
+                continue
+
+            clear_text_list = [
+                re.sub(r"\s+", " ", x) for x in get_row_text(node) if x.strip()
+            ]
+            clear_text_list = self._process_ndo(clear_text_list, name)
+            text = "|".join(clear_text_list)
+            res.append((text, splicing_url(cur_url, url)))
 
         return res
 
-    def extract_detail(self, html: str, cur_url: Optional[str] = None) -> str:
+    def extract_detail(
+        self, html: Union[str, Document], cur_url: Optional[str] = None
+    ) -> str:
         """提取详情页"""
 
         cur_url = cur_url or self.base_url or ""
-        element = html2element(html)
-
-        for node in iter_node(element):
-            if node.tag.lower() == "a":
-                text = "".join(node.xpath(".//text()"))
-                if detail_keyword_pattern.search(text):
-                    return (
-                        splicing_url(cur_url, url[0])
-                        if (url := node.xpath(".//@href"))
-                        else ""
-                    )
+        doc = to_document(html)
+
+        # 找到第一个匹配的 a 标签后立即结束遍历
+        for node, text in doc.iter_anchors():
+            if detail_keyword_pattern.search(text):
+                url = get_anchor_href(node)
+                return "" if url is None else splicing_url(cur_url, url)
 
     def _extract_chapters_with_tag(
-        self, element: HtmlElement, tags: List[Tuple], min_valid_count: int = 20
-    ):
+        self,
+        tag_counts: Tuple[List[HtmlElement], Dict[str, List[int]]],
+        tags: List[Tuple],
+        min_valid_count: int = 20,
+    ) -> List[Tuple[str, str]]:
         # out tag, inner tag, (invalid tag, invalid text)
         father, child, (sp, sp_text) = tags
-        ul_list: List[HtmlElement] = element.xpath(f"//{father}")
+        nodes, counts = tag_counts
 
         max_li_count: int = 0
         target_ul: Optional[HtmlElement] = None
 
         # 找到包含 `<li>` 标签最多的元素，默认该元素下包含了所有章节.
-        for ul in ul_list:
-            li_count = count_text_tag(ul, f"{child}")
+        for ul, li_count in zip(nodes, counts[child]):
+            if ul.tag != father:
+                continue
+            li_count += count_direct_text(ul)
             if li_count > max_li_count:
                 max_li_count = li_count
                 target_ul = ul
@@ -291,22 +650,27 @@ class Extractor:
         if target_ul is None or max_li_count < min_valid_count * 2:
             return []
 
-        # 删除无效章节
-        if sp and sp_text:
-            remove_flag = 0
-            for i in target_ul:
-                if i.tag == sp:
-                    remove_flag = 1 if sp_text in i.text else 0
+        res = []
+        skip_flag = False
 
-                if remove_flag == 1 and i.tag == child:
-                    target_ul.remove(i)
+        for item in target_ul:
+            # 跳过无效章节，不修改节点树
+            if sp and sp_text and item.tag == sp:
+                skip_flag = sp_text in (item.text or "")
+            if skip_flag and item.tag == child:
+                continue
 
-        urls = target_ul.xpath(f".//{child}/a/@href")
-        texts = target_ul.xpath(f".//{child}/a/text()")
+            # `.//{child}/a`
+            for li in item.iter(child):
+                for a in li:
+                    if a.tag == "a" and (url := a.get("href")) is not None:
+                        res.append((url, get_direct_text(a)))
 
-        return zip(urls, texts)
+        return res
 
-    def extract_chapters(self, html: str, cur_url: Optional[str] = None) -> List[Tuple]:
+    def extract_chapters(
+        self, html: Union[str, Document], cur_url: Optional[str] = None
+    ) -> List[Tuple]:
         """提取小说章节列表
 
         这里认为小说章节放在列表标签中，例如：`ul>li`, 所以先提取出所有的 ul 标签，找到包含 li 最多的 ul 标签.
@@ -317,62 +681,82 @@ class Extractor:
         """
 
         cur_url = cur_url or self.base_url or ""
-        element = html2element(html)
+        element = to_document(html).element
 
-        res = []
         rules = [
             ("dl", "dd", ("dt", "最新章节")),
             ("ul", "li", ("", "")),
         ]
+        # 所有规则共用一次遍历的统计结果
+        tag_counts = count_descendant_tags(element, {child for _, child, _ in rules})
 
         for tags in rules:
-            cs = self._extract_chapters_with_tag(element, tags, min_valid_count=20)
+            cs = self._extract_chapters_with_tag(tag_counts, tags, min_valid_count=20)
             if cs:
                 break
 
         # print(list(cs.copy()))
-        for url, text in cs:
-            url = splicing_url(cur_url, url)
-            res.append((text, url))
+        urls = splicing_urls(cur_url, [url for url, _ in cs])
+        res = [(text, url) for (_, text), url in zip(cs, urls)]
 
         return res
 
-    def extract_content(self, html: str) -> str:
-        """提取正文"""
-
-        element = html2element(html)
+    def _content_features(self, element: HtmlElement) -> Tuple[List[HtmlElement], Dict]:
         body: HtmlElement = element.xpath("//body")[0]
 
-        node_info_list = {}
-
-        for node in iter_node(body):
-            node_hash = hash(node)
-            density_info = calc_text_density(node)
-            sbdi = calc_sbdi(
-                density_info["ti_text"], density_info["ti"], density_info["lti"]
-            )
-            p_tag_count = count_text_tag(node, tag="p")
-
-            node_info = {
-                "ti": density_info["ti"],
-                "lti": density_info["lti"],
-                "tgi": density_info["tgi"],
-                "ltgi": density_info["ltgi"],
-                "density": density_info["density"],
-                "text": density_info["ti_text"],
-                "p_tag_count": p_tag_count,
-                "sbdi": sbdi,
-                "node": node,
-            }
-            node_info_list[node_hash] = node_info
-
-        calc_new_score(node_info_list)
-
-        result = sorted(
-            node_info_list.items(), key=lambda x: x[1]["score"], reverse=True
-        )
+        return calc_all_text_density(body)
+
+    def _extract_content_with_template(
+        self, element: HtmlElement, key: str
+    ) -> Optional[str]:
+        xpath = self.template_cache.get(key)
+        if xpath is None:
+            return None
+
+        nodes = xpath(element)
+        if len(nodes) != 1:
+            return None
+
+        text = "\n".join(get_all_text_of_element(nodes[0]))
+        return text if self.template_cache.validate(key, text) else None
+
+    def extract_content(
+        self, html: Union[str, Document], key: Optional[str] = None
+    ) -> str:
+        """提取正文
+
+        Args:
+            html (Union[str, Document]): 页面源码或解析后的页面.
+            key (Optional[str]): 模板缓存的 key，通常为站点 host 或书籍 url，同一个 key
+                下的页面应该使用相同的模板. 为空时不使用模板缓存.
+        """
+
+        element = to_document(html).element
 
-        # for i in range(5):
-        #     print(result[i][1])
+        if key and (text := self._extract_content_with_template(element, key)):
+            return text
 
-        return result[0][1]["text"]
+        nodes, features = self._content_features(element)
+        scores = self.scorer.score(features)
+
+        # 只为得分最高的节点拼接文本
+        node = nodes[top_k(scores)[0]]
+        text = "\n".join(get_all_text_of_element(node))
+
+        if key:
+            self.template_cache.learn(key, element_signature(node), text)
+
+        return text
+
+    def extract_contents(self, html_list: List[Union[str, Document]]) -> List[str]:
+        """批量提取多个页面的正文，所有页面的节点一次性打分."""
+
+        pages = [
+            self._content_features(to_document(html).element) for html in html_list
+        ]
+        scores_list = self.scorer.score_batch([features for _, features in pages])
+
+        return [
+            "\n".join(get_all_text_of_element(nodes[top_k(scores)[0]]))
+            for (nodes, _), scores in zip(pages, scores_list)
+        ]
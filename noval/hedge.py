@@ -0,0 +1,161 @@
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib import parse
+import asyncio
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Recent latencies of the good responses of each host."""
+
+    def __init__(self, window: int = 100, min_samples: int = 10) -> None:
+        self.window = window
+        self.min_samples = min_samples
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float) -> None:
+        with self._lock:
+            if (latencies := self._latencies.get(host)) is None:
+                latencies = self._latencies[host] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def quantile(self, host: str, q: float) -> Optional[float]:
+        """The q quantile of the latencies, `None` before `min_samples` samples."""
+
+        with self._lock:
+            latencies = self._latencies.get(host)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            latencies = sorted(latencies)
+
+        return latencies[int(q * (len(latencies) - 1))]
+
+
+class Hedger:
+    """Send a duplicate request when the first one is slower than usual.
+
+    If a request hasn't got a good result after the `quantile` latency of its
+    host, the same request is sent again and the first good result wins, the
+    other is cancelled if not started yet, or its result is dropped. Each
+    request earns `ratio` hedge, so at most about `ratio` extra requests are sent
+    even when the site is slow for everyone.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.9,
+        ratio: float = 0.1,
+        min_delay: float = 0.05,
+        workers: int = 32,
+    ) -> None:
+        self.quantile = quantile
+        self.ratio = ratio
+        self.min_delay = min_delay
+        self.workers = workers
+
+        self.tracker = LatencyTracker()
+        # Hedges can be sent now, earned by the requests.
+        self._budget = 0.0
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def delay(self, url: str) -> Optional[float]:
+        """How long to wait before hedging a request to url, `None` means no hedge."""
+
+        delay = self.tracker.quantile(parse.urlparse(url).netloc, self.quantile)
+        return None if delay is None else max(delay, self.min_delay)
+
+    def _earn(self) -> None:
+        with self._lock:
+            # Keep a few for a burst of slow requests.
+            self._budget = min(self._budget + self.ratio, 10.0)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def _timed(self, url: str, fn: Callable[[], Optional[T]]) -> Optional[T]:
+        start = time.monotonic()
+        if (res := fn()) is not None:
+            self.tracker.record(parse.urlparse(url).netloc, time.monotonic() - start)
+        return res
+
+    def call(self, url: str, fn: Callable[[], Optional[T]]) -> Optional[T]:
+        """Return the first good result of `fn`, a request to url, `None` is failed."""
+
+        self._earn()
+        if (delay := self.delay(url)) is None:
+            return self._timed(url, fn)
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers)
+            pool = self._pool
+
+        futures = {pool.submit(self._timed, url, fn)}
+        done, _ = wait(futures, timeout=delay)
+        if not done and self._spend():
+            futures.add(pool.submit(self._timed, url, fn))
+
+        res = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if (res := future.result()) is not None:
+                    for other in futures:
+                        other.cancel()
+                    return res
+        return res
+
+    async def acall(
+        self, url: str, fn: Callable[[], Awaitable[Optional[T]]]
+    ) -> Optional[T]:
+        """Async version of `call`, `fn` returns a new coroutine each time."""
+
+        async def timed() -> Optional[T]:
+            start = time.monotonic()
+            if (res := await fn()) is not None:
+                self.tracker.record(
+                    parse.urlparse(url).netloc, time.monotonic() - start
+                )
+            return res
+
+        self._earn()
+        if (delay := self.delay(url)) is None:
+            return await timed()
+
+        tasks = {asyncio.ensure_future(timed())}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and self._spend():
+            tasks.add(asyncio.ensure_future(timed()))
+
+        res = None
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if (res := task.result()) is not None:
+                        return res
+            return res
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def close(self) -> None:
+        """Stop the hedge threads after the requests sent, later calls start new ones."""
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -2,7 +2,10 @@ from typing import Dict, Optional, Tuple
 import os
 
 from .utils import slice_list
+from .cache import ResponseCache
+from .store import ChapterStore
 from .downloader import Downloader
+from .writer import new_chapters
 from .pretty import console, fiction_table, download_with_bar, Panel
 
 
@@ -23,6 +26,54 @@ def get_choice(num: int) -> int:
     return idx
 
 
+def _export(
+    fiction_name: str,
+    dir_path: Optional[str] = None,
+    chapter_range: Optional[Tuple[int, int]] = None,
+    split: Optional[int] = None,
+    fmt: str = "txt",
+) -> None:
+    """Export a book saved in the local store, without any request."""
+
+    store = ChapterStore()
+    books = store.find_books(fiction_name)
+    if not books:
+        console.print(f"[red]No book named '{fiction_name}' in the store.")
+        return
+
+    console.print(
+        fiction_table(
+            [
+                (f"{name}|-|{saved}/{total} chapters saved", url)
+                for _, url, name, saved, total in books
+            ]
+        )
+    )
+    book_id, _, real_name, _, total = books[get_choice(len(books))]
+
+    real_path = os.path.join(dir_path, real_name) if dir_path else real_name
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+
+    # Same chapters as a download with `chapter_range` and `split`.
+    start, end = 0, total
+    if chapter_range:
+        start, end = chapter_range[0] - 1, min(chapter_range[1] - 1, total)
+
+    if split and split > 1:
+        size = (end - start) // split + 1
+        parts = [
+            (f"{real_path}_{part_id}.{fmt}", part_start, min(part_start + size, end))
+            for part_id, part_start in enumerate(range(start, end, size), start=1)
+        ]
+    else:
+        parts = [(f"{real_path}.{fmt}", start, end)]
+
+    for path, part_start, part_end in parts:
+        count = store.export(book_id, path, part_start, part_end)
+        console.print(f"[green bold]Exported {count} chapters to {path}")
+
+
 def _entry(
     fiction_name: str,
     dir_path: Optional[str] = None,
@@ -30,16 +81,49 @@ def _entry(
     chapter_range: Optional[Tuple[int, int]] = None,
     split: Optional[int] = None,
     append_mode: bool = False,
+    resume: bool = False,
+    update: bool = False,
+    workers: int = 0,
+    cache: bool = True,
+    fmt: str = "txt",
+    store: bool = False,
+    offline: bool = False,
 ) -> None:
-    dl = Downloader(verify=False)
+    if fmt == "epub" and (append_mode or resume or update):
+        # The book is only complete when all chapters are written.
+        console.print("[red]Can't append, resume or update an epub file.")
+        return
+
+    if update and split and split > 1:
+        # The saved chapters are looked up in one file, not the parts.
+        console.print("[red]Can't update a split download.")
+        return
+
+    if offline:
+        if append_mode or resume or update:
+            console.print("[red]The store is only exported to new files.")
+            return
+        _export(fiction_name, dir_path, chapter_range, split, fmt)
+        return
+
+    dl = Downloader(
+        verify=False,
+        fetch_workers=workers,
+        cache=ResponseCache() if cache else None,
+        store=ChapterStore() if store else None,
+    )
 
     # Search
     search_res = []
     with console.status(
         f"Search: [bold green]'{fiction_name}'...", spinner="shark"
-    ) as _:
+    ) as status:
+        # Mirrors are searched at once, results are shown as soon as they arrive.
         for part_search_res in dl.search_fiction(fiction_name):
             search_res.extend(part_search_res)
+            status.update(
+                f"Search: [bold green]'{fiction_name}'... {len(search_res)} found"
+            )
 
     if not search_res:
         console.print("[red]Can't get search result page.")
@@ -75,9 +159,26 @@ def _entry(
     chapter_display_str = f"[Total chapters {len(chapters)}]"
     console.print(f"{chapter_display_str:=^100}")
 
+    # Saved chapters are read from the store instead of downloading again.
+    book_id = dl.store and dl.store.add_book(next_url, real_name, chapters)
+
     if chapter_range:
         chapters = chapters[chapter_range[0] - 1 : chapter_range[1] - 1]
 
+    if update:
+        # Only the chapters not saved yet, appended to the file.
+        chapters = new_chapters(f"{real_path}.txt", chapters)
+        console.print(f"[green]New chapters: {len(chapters)}")
+        if not chapters:
+            return
+        resume = True
+
+    # Bytes saved, counted by the writer thread.
+    written = [0]
+
+    def on_written(size: int) -> None:
+        written[0] += size
+
     # Download
     if split and split > 1:
         for part_id, part_res in enumerate(
@@ -86,25 +187,33 @@ def _entry(
             download_with_bar(
                 dl.download_chapters(
                     part_res,
-                    f"{real_path}.txt".replace(".txt", f"_{part_id}.txt"),
+                    f"{real_path}_{part_id}.{fmt}",
                     sep,
                     append_mode,
+                    resume,
+                    on_written,
+                    book_id,
                 ),
                 len(part_res),
                 f"[green bold]Download part {part_id}...",
                 f"[green bold]Part {part_id} downloaded",
+                lambda: written[0],
             )
     else:
         download_with_bar(
             dl.download_chapters(
                 chapters,
-                f"{real_path}.txt",
+                f"{real_path}.{fmt}",
                 sep,
                 append_mode,
+                resume,
+                on_written,
+                book_id,
             ),
             len(chapters),
             "[green bold]Download...",
             "[green bold]Downloaded",
+            lambda: written[0],
         )
 
 
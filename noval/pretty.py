@@ -1,6 +1,7 @@
-from typing import List, Generator
+from typing import Callable, List, Generator, Optional
 
 from rich.console import Console, Group
+from rich.filesize import decimal
 from rich.table import Table
 from rich.panel import Panel
 from rich.live import Live
@@ -35,7 +36,10 @@ def download_with_bar(
     total: int,
     desc: str = "download",
     over_desc: str = "downloaded",
+    written: Optional[Callable[[], int]] = None,
 ) -> None:
+    """Show the progress of a download generator, `written` returns bytes saved."""
+
     current_show_progress = Progress(
         TimeElapsedColumn(),
         TextColumn("{task.description}"),
@@ -45,12 +49,13 @@ def download_with_bar(
         BarColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TimeRemainingColumn(),
+        TextColumn("[cyan]{task.fields[size]}"),
     )
     progress_group = Group(current_show_progress, overall_progress)
 
     with Live(progress_group):
         current_show_id = current_show_progress.add_task("")
-        overall_task_id = overall_progress.add_task(desc, total=total)
+        overall_task_id = overall_progress.add_task(desc, total=total, size="")
 
         for idx, (chapter_name, url) in enumerate(gen):
             if chapter_name is None:
@@ -65,7 +70,11 @@ def download_with_bar(
                 current_show_progress.update(
                     current_show_id, description=f"「{idx:^7}」 {chapter_name} {url}"
                 )
-                overall_progress.update(overall_task_id, advance=1)
+                overall_progress.update(
+                    overall_task_id,
+                    advance=1,
+                    size=decimal(written()) if written is not None else "",
+                )
 
         overall_progress.update(overall_task_id, description=over_desc)
         current_show_progress.stop_task(current_show_id)
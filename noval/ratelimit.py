@@ -0,0 +1,200 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib import parse
+import threading
+import time
+
+# Status codes meaning the site wants us to slow down.
+THROTTLE_STATUS = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse the `Retry-After` header, seconds or a HTTP date, to seconds."""
+
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class TokenBucket:
+    """Token bucket of one host, allow `rate` requests per second and `burst` at once.
+
+    `rate` is `None` means no limit, but the cool down set by `backoff` still works.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_backoff = max_backoff
+
+        # Theoretical time of the next request (GCRA), keeps requests evenly
+        # spaced while allowing `burst` requests at once.
+        self._tat = 0.0
+        # No request before this time, set when the site throttles us.
+        self._not_before = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve a slot and return how long the caller should wait before sending."""
+
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._not_before)
+
+            if self.rate:
+                interval = 1 / self.rate
+                tat = max(self._tat, send_at)
+                send_at = max(tat - (self.burst - 1) * interval, send_at)
+                self._tat = tat + interval
+
+            return send_at - now
+
+    def configure(self, rate: Optional[float], burst: int = 1) -> None:
+        """Change the limit, the slots already reserved keep their time."""
+
+        with self._lock:
+            self.rate, self.burst = rate, burst
+
+    def cooldown(self) -> float:
+        """Seconds left of the cool down set by `backoff`."""
+
+        with self._lock:
+            return max(self._not_before - time.monotonic(), 0.0)
+
+    def backoff(self, delay: Optional[float] = None) -> None:
+        """Stop sending for `delay` seconds, exponential when not given.
+
+        The throttled responses to the requests sent before the cool down don't
+        make it longer, only a throttle after it does.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._not_before:
+                self._failures += 1
+            if delay is None:
+                delay = min(2 ** max(self._failures - 1, 0), self.max_backoff)
+            self._not_before = max(self._not_before, now + delay)
+
+    def reset(self) -> None:
+        """Called after a normal response, reset the exponential backoff."""
+
+        with self._lock:
+            self._failures = 0
+
+
+class RateLimiter:
+    """Per host rate limiter, one `TokenBucket` for each host.
+
+    Module level `rate_limiter` is shared by every `Downloader` in the process by
+    default, so concurrent crawls of the same site are throttled together.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = 1) -> None:
+        # Default limit of hosts without custom setting.
+        self.rate = rate
+        self.burst = burst
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        # host -> (rate, burst) set by `set_rate`.
+        self._rates: Dict[str, Tuple[Optional[float], int]] = {}
+        # host -> rates of the `limit` contexts in use.
+        self._limits: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return parse.urlparse(url).netloc or url
+
+    def _bucket(self, host: str) -> TokenBucket:
+        if (bucket := self._buckets.get(host)) is None:
+            rate, burst = self._rates.get(host, (self.rate, self.burst))
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def bucket(self, url: str) -> TokenBucket:
+        with self._lock:
+            return self._bucket(self._host(url))
+
+    def _configure(self, host: str) -> None:
+        # Called with the lock, the lowest rate of the `limit` contexts applies.
+        rate, burst = self._rates.get(host, (self.rate, self.burst))
+        if limits := self._limits.get(host):
+            rate, burst = min(limits if rate is None else [rate, *limits]), 1
+        self._bucket(host).configure(rate, burst)
+
+    def set_rate(self, url: str, rate: Optional[float], burst: int = 1) -> None:
+        """Set custom limit of the host of url, it can be a host or an url."""
+
+        host = self._host(url)
+        with self._lock:
+            self._rates[host] = (rate, burst)
+            self._configure(host)
+
+    @contextmanager
+    def limit(self, urls: Iterable[str], rate: Optional[float]) -> Iterator[None]:
+        """Limit the hosts of urls to `rate` requests per second within the context.
+
+        The contexts of the same host can overlap, the lowest rate of them applies,
+        the host is back to its own limit when all of them exit. `None` rate adds
+        no limit.
+        """
+
+        hosts = set() if rate is None else {self._host(url) for url in urls}
+        with self._lock:
+            for host in hosts:
+                self._limits.setdefault(host, []).append(rate)
+                self._configure(host)
+        try:
+            yield
+        finally:
+            with self._lock:
+                for host in hosts:
+                    self._limits[host].remove(rate)
+                    if not self._limits[host]:
+                        del self._limits[host]
+                    self._configure(host)
+
+    def waits(self, url: str) -> Iterator[float]:
+        """Reserve a request to the host of url, yield the seconds to sleep before it.
+
+        So the same limit works for the blocking and the async callers.
+        """
+
+        bucket = self.bucket(url)
+        wait = bucket.reserve()
+        while wait > 0:
+            yield wait
+            # The site throttled us while waiting, take a new slot after the cool down.
+            wait = bucket.reserve() if bucket.cooldown() > 0 else 0
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to the host of url is allowed."""
+
+        for wait in self.waits(url):
+            time.sleep(wait)
+
+    def backoff(self, url: str, retry_after: Optional[str] = None) -> None:
+        self.bucket(url).backoff(parse_retry_after(retry_after))
+
+    def reset(self, url: str) -> None:
+        self.bucket(url).reset()
+
+
+rate_limiter = RateLimiter()
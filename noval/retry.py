@@ -0,0 +1,97 @@
+from typing import Dict, Iterable, Optional
+from urllib import parse
+import random
+import threading
+import time
+
+# Server errors worth another try, 429 and 503 are also handled by the rate limiter.
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a request.
+
+    The delay of the n-th retry is a random value in `[0, min(max_backoff,
+    backoff * 2 ** n)]` (full jitter), so concurrent requests don't retry a
+    mirror at the same time.
+    """
+
+    def __init__(
+        self,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        retry_status: Optional[Iterable[int]] = None,
+    ) -> None:
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_status = set(RETRY_STATUS if retry_status is None else retry_status)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before the retry `attempt`, start from 0."""
+
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def should_retry(self, status: int) -> bool:
+        return status in self.retry_status
+
+
+class CircuitBreaker:
+    """Per host circuit breaker.
+
+    After `threshold` failures in a row the host is considered dead, requests to
+    it fail immediately for `reset_timeout` seconds. Then one trial request is let
+    through, the circuit is closed again if it succeeds.
+
+    Module level `circuit_breaker` is shared by every `Downloader` in the process
+    by default.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        # host -> [failures in a row, open until]
+        self._hosts: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return parse.urlparse(url).netloc or url
+
+    def allow(self, url: str) -> bool:
+        """Whether a request to the host of url can be sent."""
+
+        with self._lock:
+            state = self._hosts.get(self._host(url))
+            if state is None or state[0] < self.threshold:
+                return True
+
+            now = time.monotonic()
+            if now < state[1]:
+                return False
+
+            # Half open, let this one try and keep others waiting.
+            state[1] = now + self.reset_timeout
+            return True
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            self._hosts.pop(self._host(url), None)
+
+    def record_failure(self, url: str) -> None:
+        with self._lock:
+            state = self._hosts.setdefault(self._host(url), [0, 0.0])
+            state[0] += 1
+            if state[0] >= self.threshold:
+                state[1] = time.monotonic() + self.reset_timeout
+
+    def is_open(self, url: str) -> bool:
+        with self._lock:
+            state = self._hosts.get(self._host(url))
+            return state is not None and state[0] >= self.threshold
+
+
+circuit_breaker = CircuitBreaker()
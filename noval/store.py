@@ -0,0 +1,273 @@
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+from .const import STORE_PATH
+from .epub import EpubWriter
+from .writer import BackgroundWriter, ChapterWriter
+
+
+class StoredChapter(NamedTuple):
+    # Index in the chapter list of the book.
+    index: int
+    name: str
+    url: str
+    # `None` when not downloaded yet.
+    content: Optional[str]
+
+
+class ChapterStore:
+    """Downloaded chapters of the books, stored in a sqlite database.
+
+    Each book keeps its chapter list, a chapter refers to its text by the sha1
+    of the text, so the same text is stored once, compressed with zlib. A
+    chapter is looked up by its index in the book or by its url, so a book can
+    be exported again, or partly, without downloading.
+    """
+
+    def __init__(self, path: str = STORE_PATH, level: int = 6) -> None:
+        self.path = path
+        # zlib compression level of the texts.
+        self.level = level
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS books ("
+            "id INTEGER PRIMARY KEY, url TEXT UNIQUE, name TEXT);"
+            "CREATE TABLE IF NOT EXISTS chapters ("
+            "book_id INTEGER, idx INTEGER, name TEXT, url TEXT, hash TEXT, "
+            "PRIMARY KEY (book_id, idx));"
+            "CREATE INDEX IF NOT EXISTS chapters_url ON chapters (url);"
+            "CREATE TABLE IF NOT EXISTS texts ("
+            "hash TEXT PRIMARY KEY, body BLOB, size INTEGER);"
+        )
+        self._db.commit()
+
+    def add_book(self, url: str, name: str, chapters: List[Tuple[str, str]]) -> int:
+        """Save the chapter list of the book at url, return the id of the book.
+
+        Chapters keep their text when the list changes, if their url is the same.
+        An empty list, like when the index failed to download, keeps the saved one.
+        """
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO books (url, name) VALUES (?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET name = excluded.name",
+                (url, name),
+            )
+            (book_id,) = self._db.execute(
+                "SELECT id FROM books WHERE url = ?", (url,)
+            ).fetchone()
+            if not chapters:
+                return book_id
+
+            hashes = dict(
+                self._db.execute(
+                    "SELECT url, hash FROM chapters WHERE book_id = ? "
+                    "AND hash IS NOT NULL",
+                    (book_id,),
+                )
+            )
+            self._db.execute("DELETE FROM chapters WHERE book_id = ?", (book_id,))
+            self._db.executemany(
+                "INSERT INTO chapters VALUES (?, ?, ?, ?, ?)",
+                (
+                    (book_id, index, chapter_name, chapter_url, hashes.get(chapter_url))
+                    for index, (chapter_name, chapter_url) in enumerate(chapters)
+                ),
+            )
+        return book_id
+
+    def book(self, url: str) -> Optional[int]:
+        """Id of the book at url, `None` if not saved."""
+
+        with self._lock:
+            row = self._db.execute("SELECT id FROM books WHERE url = ?", (url,))
+            row = row.fetchone()
+        return row and row[0]
+
+    def find_books(self, name: str) -> List[Tuple[int, str, str, int, int]]:
+        """Books with name containing `name`, as (id, url, name, saved, total)."""
+
+        with self._lock:
+            return self._db.execute(
+                "SELECT b.id, b.url, b.name, COUNT(c.hash), COUNT(c.idx) "
+                "FROM books b LEFT JOIN chapters c ON c.book_id = b.id "
+                "WHERE instr(b.name, ?) > 0 GROUP BY b.id ORDER BY b.id",
+                (name,),
+            ).fetchall()
+
+    def _text(self, hash: Optional[str]) -> Optional[str]:
+        if hash is None:
+            return None
+        row = self._db.execute(
+            "SELECT body FROM texts WHERE hash = ?", (hash,)
+        ).fetchone()
+        return row and zlib.decompress(row[0]).decode("utf-8")
+
+    def get(self, book_id: int, index: int) -> Optional[StoredChapter]:
+        """The chapter at index of the book, `None` if out of the chapter list."""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, url, hash FROM chapters WHERE book_id = ? AND idx = ?",
+                (book_id, index),
+            ).fetchone()
+            if row is None:
+                return None
+            return StoredChapter(index, row[0], row[1], self._text(row[2]))
+
+    def content(self, url: str) -> Optional[str]:
+        """Saved content of the chapter at url, of any book."""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash FROM chapters WHERE url = ? AND hash IS NOT NULL LIMIT 1",
+                (url,),
+            ).fetchone()
+            return row and self._text(row[0])
+
+    def put(self, book_id: int, url: str, content: str, commit: bool = True) -> None:
+        """Save the content of the chapter at url of the book."""
+
+        data = content.encode("utf-8")
+        hash = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if not self._db.execute(
+                "SELECT 1 FROM texts WHERE hash = ?", (hash,)
+            ).fetchone():
+                self._db.execute(
+                    "INSERT INTO texts VALUES (?, ?, ?)",
+                    (hash, zlib.compress(data, self.level), len(data)),
+                )
+            self._db.execute(
+                "UPDATE chapters SET hash = ? WHERE book_id = ? AND url = ?",
+                (hash, book_id, url),
+            )
+            commit and self._db.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._db.commit()
+
+    def chapters(
+        self,
+        book_id: int,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        batch: int = 64,
+    ) -> Iterator[StoredChapter]:
+        """Chapters of the book with index in [start, end), read `batch` at a time."""
+
+        index = start or 0
+        end = (1 << 62) if end is None else end
+        while index < end:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT idx, name, url, hash FROM chapters "
+                    "WHERE book_id = ? AND idx >= ? AND idx < ? ORDER BY idx LIMIT ?",
+                    (book_id, index, end, batch),
+                ).fetchall()
+                chapters = [
+                    StoredChapter(idx, name, url, self._text(hash))
+                    for idx, name, url, hash in rows
+                ]
+
+            yield from chapters
+            if len(rows) < batch:
+                return
+            index = rows[-1][0] + 1
+
+    def export(
+        self,
+        book_id: int,
+        path: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> int:
+        """Write the saved chapters in [start, end) to a txt file or an epub book.
+
+        The chapters not downloaded are skipped, return the number written.
+        """
+
+        if path.lower().endswith(".epub"):
+            writer = EpubWriter(path)
+        else:
+            writer = ChapterWriter(path)
+
+        count = 0
+        with writer:
+            for chapter in self.chapters(book_id, start, end):
+                if chapter.content:
+                    writer.write(
+                        chapter.index, chapter.url, chapter.name, chapter.content
+                    )
+                    count += 1
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class StoreWriter(BackgroundWriter):
+    """Save the chapters to the store while `writer` writes them to the file.
+
+    `writer` must not write in background, it is called by this writer. The
+    store is committed every `flush_every` chapters or `flush_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        store: ChapterStore,
+        book_id: int,
+        writer: BackgroundWriter,
+        flush_every: int = 20,
+        flush_interval: float = 5.0,
+        background: bool = False,
+        max_pending: int = 64,
+    ) -> None:
+        super().__init__(flush_interval)
+        self.store = store
+        self.book_id = book_id
+        self.writer = writer
+        self.flush_every = flush_every
+        self.done = writer.done
+
+        # Chapters saved but not committed.
+        self._pending = 0
+
+        self._start(background, max_pending)
+
+    def _write(self, index: int, url: str, name: str, content: str) -> None:
+        if content:
+            self.store.put(self.book_id, url, content, commit=False)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._commit()
+
+        self.writer._write(index, url, name, content)
+        self.bytes_written = self.writer.bytes_written
+
+    def _commit(self) -> None:
+        self.store.commit()
+        self._pending = 0
+
+    def _idle(self) -> None:
+        if self._pending:
+            self._commit()
+        self.writer._idle()
+
+    def _close(self) -> None:
+        try:
+            self._commit()
+        finally:
+            self.writer.close()
@@ -1,4 +1,5 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional
+from functools import lru_cache
 from urllib import parse
 import re
 
@@ -7,14 +8,61 @@ URL_RE = re.compile(
     r"(http|ftp|https):\/\/[\w\-_]+(\.[\w\-_]+)+([\w\-\.,@?^=%&:/~\+#]*[\w\-\@?^=%&/~\+#])?"
 )
 ROOT_URL_RE = re.compile(r"^(((http|ftp|https):\/\/)?[\w\-_]+(\.[\w\-_]+)+)")
+# Hrefs that `urljoin` resolves by plain concatenation: no scheme, query, params
+# or whitespace; dot and empty segments are excluded by `UrlResolver.resolve`.
+ROOT_PATH_RE = re.compile(r"/[^/:;?#\s][^:;?#\s]*")
+RELATIVE_PATH_RE = re.compile(r"[^/:;?#.\s][^:;?#\s]*")
+
+
+class UrlResolver:
+    """Resolve hrefs against one base url, same as `splicing_url`.
+
+    The base is checked and parsed only once. Absolute, root-relative and plain
+    relative hrefs are joined by string concatenation, anything else (dot
+    segments, schemes, queries, spaces...) falls back to `urljoin`.
+    """
+
+    def __init__(self, base: str) -> None:
+        self.base = base
+        self.valid = URL_RE.match(base) is not None
+
+        # Let `urljoin` normalize the base once, then strip the placeholder.
+        self._root = parse.urljoin(base, "/_")[:-2]
+        self._dir = parse.urljoin(base, "_")[:-1]
+
+    def resolve(self, part: str) -> str:
+        # `part` is a full url or if `base` is not a valid url.
+        if not self.valid or (part.startswith(("http", "ftp")) and URL_RE.match(part)):
+            return part
+
+        if "/." not in part and "//" not in part:
+            if ROOT_PATH_RE.fullmatch(part):
+                return self._root + part
+            if RELATIVE_PATH_RE.fullmatch(part):
+                return self._dir + part
+
+        return parse.urljoin(self.base, part)
+
+    def resolve_all(self, parts: Iterable[str]) -> List[str]:
+        resolve = self.resolve
+        return [resolve(part) for part in parts]
+
+
+@lru_cache(maxsize=128)
+def get_url_resolver(base: str) -> UrlResolver:
+    """Return the cached `UrlResolver` of base, pages of one site share it."""
+
+    return UrlResolver(base)
 
 
 def splicing_url(base: str, part: str) -> str:
-    # `part` is a full url or if `base` is not a valid url.
-    if URL_RE.match(part) or not URL_RE.match(base):
-        return part
+    return get_url_resolver(base).resolve(part)
 
-    return parse.urljoin(base, part)
+
+def splicing_urls(base: str, parts: Iterable[str]) -> List[str]:
+    """Resolve a batch of hrefs against the same base."""
+
+    return get_url_resolver(base).resolve_all(parts)
 
 
 def slice_list(temp_list: List, n: int):
@@ -31,6 +79,40 @@ def get_keyword_pattern(keywords: List):
     return re.compile("|".join(keywords), flags=re.I)
 
 
+class PriorityPattern:
+    """Match a list of patterns by priority with one compiled regex.
+
+    Same as trying `re.search` for each pattern in order and returning the first
+    group of the first one matched, but it runs in one `re.match` call:
+    `^(?:.*?(p1)|.*?(p2)|...)` only tries the next alternative when the previous
+    pattern matches nowhere in the text.
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        alternatives = []
+        # group index -> first group index of the pattern it belongs to.
+        self._first_group: Dict[int, int] = {}
+
+        group_idx = 1
+        for pattern in patterns:
+            groups = re.compile(pattern).groups
+            for idx in range(group_idx, group_idx + groups):
+                self._first_group[idx] = group_idx
+            group_idx += groups
+            alternatives.append(f"(?:.*?{pattern})")
+
+        self._pattern = re.compile("|".join(alternatives), flags=re.S)
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the first group of the first matched pattern."""
+
+        match = self._pattern.match(text)
+        if match is None or match.lastindex is None:
+            return None
+
+        return match[self._first_group[match.lastindex]]
+
+
 if __name__ == "__main__":
     l = [
         ("https://www.shuquge.com/txt/72275/index.html", "11220127.html"),
@@ -0,0 +1,339 @@
+from typing import Callable, Dict, IO, List, NamedTuple, Optional, Set, Tuple
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+
+class ChapterRecord(NamedTuple):
+    # Index in the chapter list being downloaded.
+    index: int
+    url: str
+    # Byte offset and size of the chapter in the fiction file.
+    offset: int
+    size: int
+    # sha1 of the chapter bytes.
+    hash: str
+    name: str = ""
+
+
+def manifest_path(path: str) -> str:
+    return f"{path}.manifest"
+
+
+def _name_key(name: str) -> str:
+    return re.sub(r"\s+", "", name)
+
+
+def saved_names(path: str) -> Set[str]:
+    """Chapter names in a fiction file written without manifest.
+
+    Each chapter is written as its name followed by the indented content, so
+    the lines not indented are the names.
+    """
+
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            return {_name_key(line) for line in f if line.strip() and line[0] != " "}
+    except FileNotFoundError:
+        return set()
+
+
+def new_chapters(path: str, chapters: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """The chapters not saved in the fiction file yet, in the order of `chapters`.
+
+    A chapter is saved when its url or its name is in the manifest, so the
+    chapters of a site renumbering the urls are not downloaded again. Names in
+    the file are used when it has no manifest.
+    """
+
+    end, records = load_manifest(path)
+    urls = {record.url for record in records}
+    if end is None:
+        names = saved_names(path)
+    else:
+        names = {_name_key(record.name) for record in records if record.name}
+
+    return [
+        (name, url)
+        for name, url in chapters
+        if url not in urls and _name_key(name) not in names
+    ]
+
+
+def load_manifest(path: str) -> Tuple[Optional[int], List[ChapterRecord]]:
+    """Load the records of the chapters completely written to the fiction file.
+
+    Records are checked in order against the file, the first record out of the
+    file or with a different hash and all records after it are dropped. Also
+    return where the valid content ends, `None` when there is no manifest.
+    """
+
+    try:
+        with open(manifest_path(path), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return None, []
+
+    # The first line is where the recorded chapters start.
+    try:
+        end = min(json.loads(lines[0])["start"], size)
+    except (IndexError, KeyError, TypeError, ValueError):
+        end = 0
+
+    records = []
+    with open(path, "rb") as f:
+        for line in lines[1:]:
+            try:
+                record = ChapterRecord(**json.loads(line))
+            except (ValueError, TypeError):
+                # The last line is partially written.
+                break
+
+            if record.offset < end or record.offset + record.size > size:
+                break
+            f.seek(record.offset)
+            if hashlib.sha1(f.read(record.size)).hexdigest() != record.hash:
+                break
+
+            records.append(record)
+            end = record.offset + record.size
+
+    return end, records
+
+
+def format_chapter(name: str, content: str) -> str:
+    """The chapter as written to the fiction file, content indented by 2 spaces.
+
+    Same as `textwrap.indent(content, "  ")` for the content of `extract_content`,
+    where newline is the only line break left.
+    """
+
+    lines = ["  " + line if line.strip() else line for line in content.split("\n")]
+    return f"{name}\n" + "\n".join(lines) + "\n\n"
+
+
+class BackgroundWriter:
+    """Base of the chapter writers, optionally writing in a writer thread.
+
+    With `background`, chapters are formatted and written by a writer thread,
+    so a slow disk doesn't block the caller until `max_pending` chapters are
+    waiting. Errors of the thread are raised by the next `write` or `close`.
+
+    Subclasses implement `_write`, `_idle` and `_close`, they are called in the
+    writer thread if `background`.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 5.0,
+        on_written: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.flush_interval = flush_interval
+        # Called with the size of each chapter written, in the writer thread
+        # when `background`.
+        self.on_written = on_written
+
+        # url -> record, chapters already written.
+        self.done: Dict[str, ChapterRecord] = {}
+        # Bytes written by this writer.
+        self.bytes_written = 0
+
+        self._error: Optional[BaseException] = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self, background: bool, max_pending: int) -> None:
+        """Start the writer thread, call it after the files are opened."""
+
+        if background:
+            self._queue = queue.Queue(max_pending)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            if self._error is not None:
+                # Keep receiving, so the caller never blocks on a full queue.
+                continue
+
+            try:
+                if item:
+                    self._write(*item)
+                else:
+                    self._idle()
+            except BaseException as e:
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, index: int, url: str, name: str, content: str) -> None:
+        """Write a chapter, empty content only records the chapter."""
+
+        if self._queue is None:
+            self._write(index, url, name, content)
+        else:
+            self._raise_error()
+            self._queue.put((index, url, name, content))
+
+    def _written(self, size: int) -> None:
+        self.bytes_written += size
+        if self.on_written is not None:
+            self.on_written(size)
+
+    def _write(self, index: int, url: str, name: str, content: str) -> None:
+        raise NotImplementedError
+
+    def _idle(self) -> None:
+        """Called when no chapter comes in `flush_interval` seconds."""
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        self._close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ChapterWriter(BackgroundWriter):
+    """Write chapters to the fiction file, with a sidecar manifest `<path>.manifest`.
+
+    Every chapter written is recorded in the manifest as a json line, chapters
+    without content are recorded with size 0 so they are skipped when resuming.
+    Both files are flushed every `flush_every` chapters or `flush_interval`
+    seconds, the fiction file first, so the manifest never points to unwritten
+    bytes. With `fsync`, flushing also waits until they reach the disk.
+
+    With `resume`, the chapters in the manifest are kept in `done` and the
+    partially written tail after the last of them is truncated. With `append`,
+    chapters are appended after the current content. Otherwise the fiction file
+    is recreated.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        append: bool = False,
+        resume: bool = False,
+        flush_every: int = 20,
+        flush_interval: float = 5.0,
+        fsync: bool = False,
+        buffer_size: int = 1024 * 1024,
+        background: bool = False,
+        max_pending: int = 64,
+        on_written: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        super().__init__(flush_interval, on_written)
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync = fsync
+
+        if resume and (end := self._resume()) is not None:
+            # Drop the partially written tail.
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        elif not (append or resume):
+            open(path, "wb").close()
+            self._rewrite_manifest(0, [])
+        elif not os.path.exists(manifest_path(path)):
+            # Unknown content, keep it and record the chapters after it.
+            self._rewrite_manifest(
+                os.path.getsize(path) if os.path.exists(path) else 0, []
+            )
+
+        self._file: IO[bytes] = open(path, "ab", buffering=buffer_size)
+        self._manifest: IO[str] = open(manifest_path(path), "a", encoding="utf-8")
+        self.offset = self._file.seek(0, os.SEEK_END)
+
+        # Records of the chapters not flushed yet.
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+
+        self._start(background, max_pending)
+
+    def _resume(self) -> Optional[int]:
+        """Load the manifest, return where the valid content ends."""
+
+        end, records = load_manifest(self.path)
+        if end is None:
+            return None
+
+        self.done = {record.url: record for record in records}
+        self._rewrite_manifest(records[0].offset if records else end, records)
+        return end
+
+    def _rewrite_manifest(self, start: int, records: List[ChapterRecord]) -> None:
+        tmp_path = f"{manifest_path(self.path)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"start": start}) + "\n")
+            for record in records:
+                f.write(json.dumps(record._asdict(), ensure_ascii=False) + "\n")
+        os.replace(tmp_path, manifest_path(self.path))
+
+    def _write(self, index: int, url: str, name: str, content: str) -> None:
+        data = format_chapter(name, content).encode("utf-8") if content else b""
+        self._file.write(data)
+
+        record = ChapterRecord(
+            index, url, self.offset, len(data), hashlib.sha1(data).hexdigest(), name
+        )
+        self.offset += len(data)
+        self.done[url] = record
+
+        self._pending.append(json.dumps(record._asdict(), ensure_ascii=False) + "\n")
+        if (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+        self._written(len(data))
+
+    def _idle(self) -> None:
+        # Flush the records while no chapter comes.
+        if self._pending:
+            self.flush()
+
+    def flush(self) -> None:
+        """Flush the chapters written, call it in the writer thread if `background`."""
+
+        # The chapters must reach the file before their records.
+        self._file.flush()
+        self.fsync and os.fsync(self._file.fileno())
+        self._manifest.writelines(self._pending)
+        self._manifest.flush()
+        self.fsync and os.fsync(self._manifest.fileno())
+        self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def _close(self) -> None:
+        if not self._file.closed:
+            try:
+                self.flush()
+            finally:
+                self._file.close()
+                self._manifest.close()
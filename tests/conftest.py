@@ -0,0 +1,47 @@
+import os, sys, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+NOVAL_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, NOVAL_PATH)
+
+HTML_PATH = os.path.join(NOVAL_PATH, "example", "html")
+
+
+def read_html(name: str) -> bytes:
+    with open(os.path.join(HTML_PATH, name), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def pages():
+    """Pages served by the `server` fixture, path -> (body, Content-Type)."""
+    return {}
+
+
+@pytest.fixture
+def server(pages):
+    """A local site serving `pages`, yield its root url."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in pages:
+                self.send_error(404)
+                return
+
+            body, content_type = pages[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
@@ -0,0 +1,68 @@
+from noval.charset import (
+    CharsetResolver,
+    charset_from_content_type,
+    decode,
+    normalize_encoding,
+    sniff_charset,
+)
+
+GBK_PAGE = '<html><head><meta charset="gbk"></head><body>中文</body></html>'.encode(
+    "gbk"
+)
+
+
+def test_normalize_encoding():
+    assert normalize_encoding("UTF-8") == "utf-8"
+    # Decoded with the superset.
+    assert normalize_encoding("gb2312") == "gb18030"
+    assert normalize_encoding("x-gbk") == "gb18030"
+    assert normalize_encoding("no-such-charset") is None
+    assert normalize_encoding(None) is None
+
+
+def test_charset_from_content_type():
+    assert charset_from_content_type("text/html; charset=GBK") == "gb18030"
+    assert charset_from_content_type('text/html; charset="utf-8"') == "utf-8"
+    assert charset_from_content_type("text/html") is None
+    assert charset_from_content_type(None) is None
+
+
+def test_sniff_charset():
+    assert sniff_charset(GBK_PAGE) == "gb18030"
+    assert (
+        sniff_charset(
+            b'<meta http-equiv="Content-Type" content="text/html; charset=gb2312">'
+        )
+        == "gb18030"
+    )
+    assert sniff_charset(b"\xef\xbb\xbf<html></html>") == "utf-8"
+    assert sniff_charset(b"<html></html>") is None
+
+
+def test_content_type_before_meta():
+    resolver = CharsetResolver()
+    assert (
+        resolver.resolve("http://a.com/1", "text/html; charset=utf-8", GBK_PAGE)
+        == "utf-8"
+    )
+
+
+def test_resolved_by_host():
+    resolver = CharsetResolver()
+    assert resolver.resolve("http://a.com/1", "text/html", GBK_PAGE) == "gb18030"
+    # Later pages of the host skip the detection.
+    assert resolver.resolve("http://a.com/2", None, b"") == "gb18030"
+    assert resolver.get("http://a.com/3") == "gb18030"
+    assert resolver.get("http://b.com/1") is None
+
+
+def test_fallback_not_cached():
+    resolver = CharsetResolver("gbk")
+    assert resolver.resolve("http://a.com/1", "text/html", b"<html></html>") == "gbk"
+    assert resolver.get("http://a.com/1") is None
+    # A later page of the host declares it.
+    assert resolver.resolve("http://a.com/2", None, GBK_PAGE) == "gb18030"
+
+
+def test_decode_replaces_broken_bytes():
+    assert decode("中文".encode("gbk") + b"\xff", "gb18030").startswith("中文")
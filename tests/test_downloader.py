@@ -0,0 +1,66 @@
+import pytest
+
+from noval.cache import ResponseCache
+from noval.downloader import Downloader
+from noval.ratelimit import RateLimiter
+from noval.retry import CircuitBreaker
+
+from conftest import read_html
+
+HTML = "text/html; charset=utf-8"
+
+
+@pytest.fixture(params=[False, True], ids=["string", "stream"])
+def downloader(request, tmp_path):
+    """Downloaders of both parse modes, with the cache, not shared with others."""
+
+    dl = Downloader(
+        retry=0,
+        stream=request.param,
+        rate_limiter=RateLimiter(),
+        circuit_breaker=CircuitBreaker(),
+        cache=ResponseCache(str(tmp_path / "cache.db")),
+    )
+    yield dl
+    dl.close()
+    dl.cache.close()
+
+
+@pytest.mark.parametrize("body", [b"", b" \r\n\t"], ids=["empty", "blank"])
+def test_empty_page_fails(downloader, server, pages, body, tmp_path):
+    pages["/empty.html"] = (body, HTML)
+    url = f"{server}/empty.html"
+
+    # Twice, the empty page is not cached.
+    for kind in ("chapter", "chapter", None):
+        assert downloader.get_document(url, kind) == (None, "")
+    assert downloader.cache.get(url) is None
+
+    assert downloader.get_chapters(url) == []
+    steps = downloader.download_chapters([("第1章", url)], str(tmp_path / "book.txt"))
+    assert next(steps) == (None, None)
+    steps.close()
+
+
+def test_empty_page_in_cache_fetched_again(downloader, server, pages):
+    pages["/1.html"] = (read_html("content_1.html"), HTML)
+    url = f"{server}/1.html"
+    # Saved by an older version.
+    downloader.cache.put(url, b"", url, {})
+
+    doc, true_url = downloader.get_document(url, "chapter")
+    assert doc is not None and true_url == url
+    assert downloader.cache.get(url).body == pages["/1.html"][0]
+
+
+def test_same_document_in_both_modes(server, pages):
+    pages["/1.html"] = (read_html("content_1.html"), HTML)
+    url = f"{server}/1.html"
+
+    contents = []
+    for stream in (False, True):
+        with Downloader(stream=stream, circuit_breaker=CircuitBreaker()) as dl:
+            doc, true_url = dl.get_document(url)
+            assert true_url == url
+            contents.append(dl._extractor.extract_content(doc))
+    assert contents[0] and contents[0] == contents[1]
@@ -0,0 +1,68 @@
+import pytest
+
+from noval.extractor import Document, Extractor, chunks2element, html2element
+
+from conftest import read_html
+
+PAGES = [
+    "chapters_1.html",
+    "chapters_2.html",
+    "chapters_3.html",
+    "content_1.html",
+    "content_2.html",
+    "desc_1.html",
+    "search_1.html",
+    "search_2.html",
+]
+URL = "https://www.example.com/book/1/index.html"
+
+
+def texts(element):
+    """Tags and words of the tree.
+
+    Only the parsed texts are normalized in the stream mode, so an `&nbsp;` is a
+    space there, but `\\xa0` in a string parsed page.
+    """
+    return [
+        (node.tag, (node.text or "").split(), (node.tail or "").split())
+        for node in element.iter()
+    ]
+
+
+def split(data: bytes, size: int):
+    """Chunks of the page, a multibyte character may be split between two."""
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("name", PAGES)
+@pytest.mark.parametrize("size", [7, 4096])
+def test_stream_parse_same_tree(name, size):
+    data = read_html(name)
+    streamed = chunks2element(split(data, size), "utf-8")
+    parsed = html2element(data.decode("utf-8"))
+
+    assert texts(streamed) == texts(parsed)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_stream_extract_same_result(name):
+    data = read_html(name)
+    extractor = Extractor()
+    streamed = Document.from_chunks(split(data, 1024), "utf-8")
+    parsed = Document(data.decode("utf-8"))
+
+    if name.startswith("content"):
+        assert extractor.extract_content(streamed) == extractor.extract_content(parsed)
+    else:
+        assert extractor.extract_chapters(streamed, URL) == extractor.extract_chapters(
+            parsed, URL
+        )
+        assert extractor.extract_detail(streamed, URL) == extractor.extract_detail(
+            parsed, URL
+        )
+
+
+@pytest.mark.parametrize("chunks", [[], [b""], [b"  \n", b"\t"]])
+def test_stream_empty_page(chunks):
+    assert chunks2element(chunks) is None
+    assert Document.from_chunks(chunks) is None
@@ -0,0 +1,55 @@
+from urllib import parse
+
+import pytest
+
+from noval.utils import UrlResolver, splicing_url, splicing_urls
+
+BASES = [
+    "https://www.shuquge.com/txt/72275/index.html",
+    "https://www.feishanzw.com/fs/50413.html",
+    "https://www.kankezw.com/Shtml62331.html",
+    "http://a.com",
+    "http://a.com/book/",
+    "http://a.com/book/1?page=2#top",
+    "https://a.com:8080/x/y/z.html",
+]
+PARTS = [
+    "11220127.html",
+    "/fs/50413/88177067.html",
+    "22648115.html",
+    "a/b/c.html",
+    "/",
+    "",
+    "./1.html",
+    "../1.html",
+    "/a/../b.html",
+    "a//b.html",
+    ".hidden",
+    "?page=3",
+    "#next",
+    "1.html?from=index",
+    "/1.html#c1",
+    "//cdn.a.com/1.html",
+    "a b.html",
+    "javascript:void(0)",
+    "mailto:a@a.com",
+    "http://b.com/1.html",
+    "https://b.com/",
+    "第1章.html",
+]
+
+
+@pytest.mark.parametrize("base", BASES)
+@pytest.mark.parametrize("part", PARTS)
+def test_same_as_urljoin(base, part):
+    assert UrlResolver(base).resolve(part) == parse.urljoin(base, part)
+
+
+def test_resolve_all():
+    resolver = UrlResolver(BASES[0])
+    assert resolver.resolve_all(PARTS) == [parse.urljoin(BASES[0], p) for p in PARTS]
+    assert splicing_urls(BASES[0], PARTS) == [splicing_url(BASES[0], p) for p in PARTS]
+
+
+def test_invalid_base_keeps_part():
+    assert UrlResolver("index.html").resolve("1.html") == "1.html"
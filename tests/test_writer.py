@@ -0,0 +1,129 @@
+import os
+
+from noval.writer import (
+    ChapterWriter,
+    format_chapter,
+    load_manifest,
+    manifest_path,
+    new_chapters,
+)
+
+CHAPTERS = [
+    ("第1章 开始", "http://a.com/1.html", "第一章的内容\n第二行"),
+    ("第2章 继续", "http://a.com/2.html", "第二章的内容"),
+    ("第3章 结束", "http://a.com/3.html", "第三章的内容"),
+]
+
+
+def write_chapters(path, chapters, **kwargs):
+    with ChapterWriter(path, **kwargs) as writer:
+        for index, (name, url, content) in enumerate(chapters):
+            writer.write(index, url, name, content)
+
+
+def expected(chapters) -> bytes:
+    return b"".join(
+        format_chapter(name, content).encode("utf-8") for name, _, content in chapters
+    )
+
+
+def test_manifest_records_written_chapters(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS)
+
+    end, records = load_manifest(path)
+    assert end == os.path.getsize(path)
+    assert [record.url for record in records] == [url for _, url, _ in CHAPTERS]
+    assert [record.name for record in records] == [name for name, _, _ in CHAPTERS]
+
+
+def test_resume_truncates_partial_tail(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS[:2])
+    # Interrupted while writing the third chapter.
+    with open(path, "ab") as f:
+        f.write("第3章 结束\n  第三".encode("utf-8"))
+
+    write_chapters(path, CHAPTERS[2:], resume=True)
+
+    with open(path, "rb") as f:
+        assert f.read() == expected(CHAPTERS)
+    assert len(load_manifest(path)[1]) == 3
+
+
+def test_resume_keeps_done_chapters(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS[:2])
+
+    writer = ChapterWriter(path, resume=True)
+    writer.close()
+    assert set(writer.done) == {url for _, url, _ in CHAPTERS[:2]}
+
+
+def test_manifest_drops_changed_chapter(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS)
+    _, records = load_manifest(path)
+
+    # Damage a byte of the second chapter, it and the chapters after are dropped.
+    with open(path, "r+b") as f:
+        f.seek(records[1].offset + 1)
+        f.write(b"X")
+
+    end, valid = load_manifest(path)
+    assert valid == records[:1]
+    assert end == records[0].offset + records[0].size
+
+    writer = ChapterWriter(path, resume=True)
+    writer.close()
+    assert os.path.getsize(path) == end
+
+
+def test_manifest_ignores_partial_last_line(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS)
+    with open(manifest_path(path), "a", encoding="utf-8") as f:
+        f.write('{"index": 3, "url": "http://a.com/4.html", "off')
+
+    assert len(load_manifest(path)[1]) == 3
+
+
+def test_manifest_drops_records_out_of_file(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS)
+    _, records = load_manifest(path)
+    with open(path, "r+b") as f:
+        f.truncate(records[2].offset + 1)
+
+    assert load_manifest(path)[1] == records[:2]
+
+
+def test_new_chapters_by_url_and_name(tmp_path):
+    path = str(tmp_path / "book.txt")
+    write_chapters(path, CHAPTERS[:2])
+
+    chapters = [
+        # The site renumbered the urls, the names are the same but the spaces.
+        ("第1章  开始", "http://b.com/11.html"),
+        # Same url, renamed.
+        ("第二章 继续", "http://a.com/2.html"),
+        ("第3章 结束", "http://b.com/13.html"),
+        ("第4章 新的", "http://b.com/14.html"),
+    ]
+    assert new_chapters(path, chapters) == chapters[2:]
+
+
+def test_new_chapters_without_manifest(tmp_path):
+    path = str(tmp_path / "book.txt")
+    with open(path, "wb") as f:
+        f.write(expected(CHAPTERS[:2]))
+
+    chapters = [
+        (name, f"http://b.com/{i}.html") for i, (name, _, _) in enumerate(CHAPTERS)
+    ]
+    assert new_chapters(path, chapters) == chapters[2:]
+
+
+def test_new_chapters_of_missing_file(tmp_path):
+    chapters = [(name, url) for name, url, _ in CHAPTERS]
+    assert new_chapters(str(tmp_path / "none.txt"), chapters) == chapters